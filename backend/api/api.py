@@ -1,4 +1,5 @@
 import json
+import math
 import re
 import time
 import os
@@ -26,6 +27,7 @@ from .pages.manga_home_page import MangaHomePage
 from .pages.manga_detail_page import MangaDetailPage
 from .pages.read_page import ReadPage
 from .pages.chatbot import Chatbot
+from .pages.chatbot_engines import Replace
 
 
 from pydantic import BaseModel
@@ -35,11 +37,32 @@ from typing import List
 from api.models import *
 from .utils.auth_utils import JWTAuth
 from .utils.manga_utils import fetch_manga_metadata
+from .cache import source_cache, read_path_index
+from .utils.anime_relevance import anime_relevance
+from .utils.async_http import async_fetcher
+from .utils.upstream import UpstreamUnavailable, upstream_guard
+from .browser import AdmissionRejected, admission, pool_stats
 from api.models import *
 
 # Initialize NinjaAPI and a Router for /scrape endpoints
 api = NinjaAPI()
 router = Router()
+
+
+@api.exception_handler(AdmissionRejected)
+def admission_rejected(request, exc):
+    """Browser budget exhausted: fail fast and tell the client when to retry."""
+    response = api.create_response(request, {"message": str(exc)}, status=503)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
+
+
+@api.exception_handler(UpstreamUnavailable)
+def upstream_unavailable(request, exc):
+    """Upstream site's circuit is open (or it is rate limited) and nothing cached could be served."""
+    response = api.create_response(request, {"message": str(exc)}, status=503)
+    response["Retry-After"] = str(max(1, math.ceil(exc.retry_after)))
+    return response
 # Initialize HomePage and LoginPage instances
 home_page = HomePage()
 login_page = LoginPage()
@@ -119,7 +142,8 @@ def watch_page_endpoint(request, slug: str, episode: str, title: str, anime_type
     Handle the /watch endpoint with an episode parameter in the URL.
     For example: /watch/dandadan-19319/ep-12?title=Dandadan&anime_type=TV
     """
-    response_data = WatchPage.watch(request, slug, episode, title, anime_type)
+    with admission.slot("watch"):
+        response_data = WatchPage.watch(request, slug, episode, title, anime_type)
 
     # Use .get() to safely retrieve anime_detail
     anime_detail = response_data.get("anime_detail", {})
@@ -193,7 +217,8 @@ def switch_episode(
         print(f"Switching episode for: {anime_title}, URL: {episode_url}")
 
         # 1. Fetch new iframe
-        new_iframe_src = IframeExtractor.fetch_iframe_src(episode_url, "sub", "Megaplay-1")
+        with admission.slot("switch-episode"):
+            new_iframe_src = IframeExtractor.fetch_iframe_src(episode_url, "sub", "Megaplay-1")
         if not new_iframe_src:
             return {"message": "Error: Failed to fetch new iframe src."}
 
@@ -245,6 +270,8 @@ def switch_episode(
 
         return {"iframe_src": new_iframe_src}
 
+    except (AdmissionRejected, UpstreamUnavailable):
+        raise
     except Exception as e:
         print("Exception occurred in switch_episode:", str(e))
         return {"message": f"Error: {str(e)}"}
@@ -323,15 +350,11 @@ def read_page_endpoint(request, full_url: str):
     cover_image_url = ""
     genres = []
     chapters = []
-    if os.path.exists(json_file):
-        try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                detail_data = json.load(f)
-            chapters = detail_data.get("chapters", [])
-            cover_image_url = detail_data.get("image", {}).get("src", "")
-            genres = detail_data.get("genres", [])
-        except Exception as e:
-            print("⚠️ Error reading manga detail JSON:", e)
+    detail_data = source_cache.load_json("manga-detail-page", json_file)
+    if detail_data is not None:
+        chapters = detail_data.get("chapters", [])
+        cover_image_url = detail_data.get("image", {}).get("src", "")
+        genres = detail_data.get("genres", [])
     else:
         print("Detail JSON file not found:", json_file)
 
@@ -362,20 +385,17 @@ def get_read_path(request, title: str):
                 "error": "Could not extract manga title or chapter.",
             }
 
-        # Search for a matching cached read path.
+        # Look up the cached read path in the (title, chapter) index.
         read_path = None
-        for file in os.listdir(read_page.CACHE_DIR):
-            if file.endswith(".json"):
-                with open(
-                    os.path.join(read_page.CACHE_DIR, file), "r", encoding="utf-8"
-                ) as f:
-                    data = json.load(f)
-                if (
-                    data.get("manga_title", "").strip().lower() == manga_title.lower()
-                    and data.get("chapter", "").strip().lower() == chapter_name.lower()
-                ):
-                    read_path = file.replace(".json", "")
-                    break
+        entry = read_path_index.lookup(manga_title, chapter_name)
+        if entry:
+            read_path = entry["read_path"]
+        elif result.get("resolved_path"):
+            # Entry cached before the index existed: its file name follows from resolved_path.
+            cache_file = read_page._get_cache_filename(result["resolved_path"])
+            if os.path.exists(cache_file):
+                read_path_index.add(manga_title, chapter_name, result["resolved_path"], cache_file)
+                read_path = os.path.splitext(os.path.basename(cache_file))[0]
 
         if not read_path:
             return {"success": False, "error": "Read path not found in cache."}
@@ -387,14 +407,13 @@ def get_read_path(request, title: str):
         cover_image_url = ""
         genres = []
         if json_files:
-            try:
-                with open(json_files[0], "r", encoding="utf-8") as f:
-                    detail_data = json.load(f)
+            detail_data = source_cache.load_json("manga-detail-page", json_files[0])
+            if detail_data is not None:
                 chapter_list = detail_data.get("chapters", [])
                 cover_image_url = detail_data.get("image", {}).get("src", "")
                 genres = detail_data.get("genres", [])
-            except Exception as e:
-                print("⚠️ Failed to load detail JSON:", e)
+            else:
+                print("⚠️ Failed to load detail JSON:", json_files[0])
 
         return {
             "success": True,
@@ -492,16 +511,28 @@ def create_read_history(request, history: ReadHistoryRequest):
 # ------------------------------
 # Search Page Endpoint
 # ------------------------------
+SEARCH_MAX_PAGE_SIZE = 100
+
+
 @router.get("/search", response=dict)
 def search_page_endpoint(
-    request, anime_title: str, applied_filters: Optional[str] = None
+    request,
+    anime_title: str,
+    applied_filters: Optional[str] = None,
+    page: Optional[int] = None,
+    page_size: Optional[int] = None,
+    stream: bool = False,
 ):
     """
     Handle the search page endpoint.
     Accepts:
       - anime_title: The title to search.
       - applied_filters: (Optional) A JSON string representing applied filters.
-    Returns combined search results (filters and cards).
+      - page / page_size: (Optional) Return only this page of results, scraping just
+        the upstream pages it needs. page_size defaults to the upstream page size.
+      - stream: (Optional) Stream NDJSON: filters and page‑1 cards first, then each
+        later page in order as it is scraped, then a `done` line.
+    Returns combined search results (filters and cards) by default.
     """
     filters_dict = {}
     if applied_filters:
@@ -509,8 +540,26 @@ def search_page_endpoint(
             filters_dict = json.loads(applied_filters)
         except Exception as e:
             return {"message": f"Error parsing applied_filters: {e}"}
+    if page is not None and page < 1:
+        return {"message": "page must be 1 or greater"}
+    if page_size is not None and not 1 <= page_size <= SEARCH_MAX_PAGE_SIZE:
+        return {"message": f"page_size must be between 1 and {SEARCH_MAX_PAGE_SIZE}"}
     search_page = SearchPage(anime_title, applied_filters=filters_dict, useCache=False)
-    results = search_page.get_search_results()
+
+    if stream:
+        # Only page 1 needs the browser; later pages stream without holding a slot.
+        with admission.slot("search"):
+            first = search_page.load_first_page()
+        lines = (json.dumps(event) + "\n" for event in search_page.stream_results(first))
+        response = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    with admission.slot("search"):
+        if page is not None:
+            return search_page.get_results_page(page, page_size)
+        results = search_page.get_search_results()
     return results
 
 
@@ -523,13 +572,82 @@ class ChatbotInput(Schema):
     message: str
 
 
+def sse_events(chunks):
+    """
+    Wraps text chunks as Server-Sent Events, ending with a `done` event.
+    A rewritten answer is sent as a `replace` event holding the full text.
+    """
+    for chunk in chunks:
+        event = "event: replace\n" if isinstance(chunk, Replace) else ""
+        yield event + "".join(f"data: {line}\n" for line in chunk.split("\n")) + "\n"
+    yield "event: done\ndata: \n\n"
+
+
+def primed(chunks):
+    """
+    Runs the `chunks` generator up to its first chunk right away, so an error raised
+    before any output (AdmissionRejected when an engine falls back to the browser)
+    becomes the endpoint's error response instead of a 200 stream carrying an error.
+    """
+    first = next(chunks, None)
+
+    def rest():
+        try:
+            if first is not None:
+                yield first
+                yield from chunks
+        finally:
+            chunks.close()
+
+    return rest()
+
+
+def plain_text_chunks(chunks):
+    """Plain text cannot take back what was sent, so a rewritten answer follows as a new paragraph."""
+    for chunk in chunks:
+        yield "\n\n" + chunk if isinstance(chunk, Replace) else chunk
+
+
 @router.post("/chatbot")
-def chatbot_endpoint(request, payload: ChatbotInput):
+def chatbot_endpoint(request, payload: ChatbotInput, stream: bool = False):
     """
     POST endpoint that returns the chatbot response all at once.
+    With ?stream=true the answer is streamed while it is generated: plain text
+    chunks, or Server-Sent Events if the client accepts text/event-stream.
     """
     bot = Chatbot()
-    full_response = bot.get_full_response(payload.message)
+    # Cached and off-topic answers need no browser, so they skip admission control too;
+    # so do answers from engines that do not drive a browser.
+    quick = bot.quick_answer(payload.message)
+    admit = quick is None and bot.engine.needs_browser
+    if stream:
+        if quick is not None:
+            chunks = [quick]
+        elif admit:
+            chunks = bot.stream_response(payload.message, check_quick=False)
+        else:
+            # A fallback engine may still take a slot before the first chunk; start the
+            # answer now so a rejection is answered with 503 rather than inside the stream.
+            chunks = primed(bot.stream_response(payload.message, check_quick=False))
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            body, content_type = sse_events(chunks), "text/event-stream"
+        else:
+            body, content_type = plain_text_chunks(chunks), "text/plain; charset=utf-8"
+        if admit:
+            # The slot is held until the stream ends or the client goes away.
+            body = admission.stream("chatbot", body)
+        response = StreamingHttpResponse(body, content_type=content_type)
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # Keep nginx from buffering the stream.
+        return response
+
+    if quick is not None:
+        return HttpResponse(quick, content_type="text/plain")
+    if admit:
+        with admission.slot("chatbot"):
+            full_response = bot.get_full_response(payload.message, check_quick=False)
+    else:
+        full_response = bot.get_full_response(payload.message, check_quick=False)
     print(full_response)
 
     return HttpResponse(full_response, content_type="text/plain")
@@ -683,6 +801,21 @@ def get_continue_reading(request):
 
 
 
+# ------------------------------
+# Metrics Endpoint
+# ------------------------------
+@api.get("/metrics", response=dict)
+def metrics(request):
+    """Admission queue depth and wait times, browser pool usage, fetcher load and per-host upstream state."""
+    return {
+        "admission": admission.metrics(),
+        "browser_pools": pool_stats(),
+        "chatbot_relevance": anime_relevance.stats(),
+        "async_fetcher": async_fetcher.stats(),
+        "upstreams": upstream_guard.stats(),
+    }
+
+
 api.add_router("/scrape", router)
 api.add_router("/auth", auth_router)
 api.add_router("/delete_item", delete_item_router)
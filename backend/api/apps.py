@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api.utils.config import get_setting
+
+        if get_setting("CHATBOT_RELEVANCE_WARMUP", True):
+            # Builds the chatbot's relevance model off the request path.
+            from api.utils.anime_relevance import anime_relevance
+
+            anime_relevance.warm_up()
@@ -0,0 +1,3 @@
+from .pool import BrowserPool, BrowserPoolBusy, BrowserPoolTimeout, get_pool, pool_stats, close_all_pools
+from .admission import AdmissionController, AdmissionRejected, admission
+from .waits import wait_for_network_idle, wait_for_stable_count
@@ -0,0 +1,190 @@
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from ..utils.config import get_setting
+
+
+class AdmissionRejected(Exception):
+    """Browser work was not admitted; the endpoint should answer 503 with Retry-After."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "endpoint", "admitted", "rejected")
+
+    def __init__(self, priority: int, seq: int, endpoint: str):
+        self.priority = priority
+        self.seq = seq
+        self.endpoint = endpoint
+        self.admitted = False
+        self.rejected = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _SlotStream:
+    """Iterates `iterable` and releases the admission slot when it ends or is closed."""
+
+    def __init__(self, controller, iterable):
+        self._controller = controller
+        self._iterable = iterable
+        self._released = False
+
+    def __iter__(self):
+        try:
+            yield from self._iterable
+        finally:
+            self.close()
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        if hasattr(self._iterable, "close"):
+            self._iterable.close()
+        self._controller.release()
+
+
+class AdmissionController:
+    """
+    Global budget for browser-backed requests.
+      - At most `max_concurrent` requests do browser work at once.
+      - Up to `max_queue` more wait, served by endpoint priority (lower number
+        first, FIFO within a priority) for at most `max_wait` seconds.
+      - When the queue is full, a newcomer that outranks the lowest-priority
+        waiter takes its place; otherwise it is rejected straight away.
+    Rejections raise AdmissionRejected, which api.py turns into 503 + Retry-After.
+    """
+
+    PRIORITIES = {
+        "watch": 0,
+        "switch-episode": 1,
+        "search": 2,
+        "chatbot": 3,
+    }
+    WAIT_SAMPLES = 1000
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16, max_wait: float = 30, retry_after: int = 5):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._admitted = {}
+        self._rejected = {}
+        self._max_depth = 0
+        self._waits = deque(maxlen=self.WAIT_SAMPLES)
+
+    def _reject(self, endpoint: str, reason: str):
+        self._rejected[endpoint] = self._rejected.get(endpoint, 0) + 1
+        print(f"[Admission] Rejected {endpoint}: {reason}")
+        return AdmissionRejected(f"Server busy ({reason}), please retry shortly.", self.retry_after)
+
+    def _grant(self):
+        # Hand free slots to the best queued waiters.
+        while self._queue and self._active < self.max_concurrent:
+            waiter = heapq.heappop(self._queue)
+            waiter.admitted = True
+            self._active += 1
+        self._cond.notify_all()
+
+    def acquire(self, endpoint: str):
+        priority = self.PRIORITIES.get(endpoint, max(self.PRIORITIES.values()) + 1)
+        started = time.monotonic()
+        with self._cond:
+            if self._active < self.max_concurrent and not self._queue:
+                self._active += 1
+                self._record_admit(endpoint, 0.0)
+                return
+
+            waiter = _Waiter(priority, next(self._seq), endpoint)
+            if len(self._queue) >= self.max_queue:
+                worst = max(self._queue)
+                if not waiter < worst:
+                    raise self._reject(endpoint, "queue full")
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst.rejected = True
+            heapq.heappush(self._queue, waiter)
+            self._max_depth = max(self._max_depth, len(self._queue))
+            self._cond.notify_all()
+
+            deadline = started + self.max_wait
+            while not waiter.admitted and not waiter.rejected:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            if waiter.admitted:
+                self._record_admit(endpoint, time.monotonic() - started)
+                return
+            if not waiter.rejected:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                raise self._reject(endpoint, f"waited {self.max_wait}s")
+            raise self._reject(endpoint, "displaced by higher-priority request")
+
+    def _record_admit(self, endpoint: str, waited: float):
+        self._admitted[endpoint] = self._admitted.get(endpoint, 0) + 1
+        self._waits.append(waited)
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._grant()
+
+    @contextmanager
+    def slot(self, endpoint: str):
+        """Holds one unit of the browser budget for the duration of the block."""
+        self.acquire(endpoint)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stream(self, endpoint: str, iterable):
+        """
+        Admits now (raising AdmissionRejected before any response is sent) and holds
+        the slot while a streaming response iterates `iterable`.
+        """
+        self.acquire(endpoint)
+        return _SlotStream(self, iterable)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            depth_by_endpoint = {}
+            for waiter in self._queue:
+                depth_by_endpoint[waiter.endpoint] = depth_by_endpoint.get(waiter.endpoint, 0) + 1
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queue_depth": len(self._queue),
+                "queue_depth_by_endpoint": depth_by_endpoint,
+                "max_queue_depth": self._max_depth,
+                "admitted": dict(self._admitted),
+                "rejected": dict(self._rejected),
+                "wait_seconds": {
+                    "samples": len(waits),
+                    "mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                    "p50": round(waits[len(waits) // 2], 4) if waits else 0.0,
+                    "p95": round(waits[int(len(waits) * 0.95) - 1], 4) if len(waits) >= 20 else None,
+                    "max": round(waits[-1], 4) if waits else 0.0,
+                },
+            }
+
+
+admission = AdmissionController(**get_setting("BROWSER_ADMISSION", {}))
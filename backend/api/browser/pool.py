@@ -0,0 +1,363 @@
+import os
+import time
+import atexit
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import undetected_chromedriver as uc
+
+from ..utils.config import get_setting
+
+
+class BrowserPoolTimeout(Exception):
+    """No browser became available within the lease timeout."""
+
+
+class BrowserPoolBusy(BrowserPoolTimeout):
+    """The wait queue for the pool is full; the caller should back off."""
+
+
+# Chrome 117+ headless detection fix, applied through CDP on profiles that need it.
+DESKTOP_USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/117.0.0.0 Safari/537.36"
+)
+
+# Requests no scrape needs: images, fonts, media and ad/analytics hosts.
+# Patterns use CDP Network.setBlockedURLs syntax ("*" wildcards); each extension
+# is blocked with and without a query string (CDNs often add "?v=..." or "?w=...").
+BLOCKED_EXTENSIONS = [
+    "png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico",
+    "woff", "woff2", "ttf", "otf", "eot",
+    "mp4", "webm", "m3u8", "ts", "mp3", "m4a",
+]
+BLOCKED_URL_PATTERNS = [pattern for ext in BLOCKED_EXTENSIONS for pattern in (f"*.{ext}", f"*.{ext}?*")] + [
+    "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*adservice.google.*", "*facebook.net*",
+    "*hotjar.com*", "*clarity.ms*", "*scorecardresearch.com*", "*histats.com*",
+    "*popads.net*", "*propellerads.com*", "*adsterra.com*", "*disqus.com*",
+]
+
+IMAGES_OFF = "--blink-settings=imagesEnabled=false"
+
+# Session settings shared by every pool unless its profile overrides them.
+# "eager" returns from driver.get() at DOMContentLoaded; callers wait for
+# the elements they need explicitly (see api/browser/waits.py).
+DEFAULT_SESSION = {
+    "page_load_strategy": "eager",
+    "block_resources": True,
+}
+
+# Chrome flags per pool, matching what each call site used to pass to uc.Chrome.
+PROFILES = {
+    "scrape": {
+        "arguments": [
+            "--disable-gpu",
+            "--headless",
+            IMAGES_OFF,
+            "--window-size=1920x1080",
+        ],
+        "size": 2,
+    },
+    "search": {
+        # Search pages are loaded with a visible browser, as before.
+        "arguments": [],
+        "size": 1,
+    },
+    "chatbot": {
+        "arguments": [
+            "--headless=new",
+            "--disable-gpu",
+            "--window-size=1920x1080",
+            "--disable-blink-features=AutomationControlled",
+        ],
+        "user_agent": DESKTOP_USER_AGENT,
+        "size": 1,
+        # ChatGPT needs its own scripts and page load; only the launch is pooled.
+        "page_load_strategy": "normal",
+        "block_resources": False,
+    },
+    "read": {
+        # Chapter reads are the busiest path: a bounded queue turns overload into
+        # a quick "busy" answer instead of piling up requests behind the browsers.
+        "arguments": [
+            "--headless=new",
+            "--disable-gpu",
+            "--window-size=1920x1080",
+            "--disable-blink-features=AutomationControlled",
+        ],
+        "user_agent": DESKTOP_USER_AGENT,
+        "size": 2,
+        "lease_timeout": 45,
+        "max_waiters": 8,
+    },
+    "read-visible": {
+        # ReadPage(headless=False), for debugging the reader locally.
+        "arguments": [
+            "--disable-gpu",
+            "--window-size=1920x1080",
+            "--disable-blink-features=AutomationControlled",
+        ],
+        "user_agent": DESKTOP_USER_AGENT,
+        "size": 1,
+    },
+}
+
+
+def _rss_mb(pid: int) -> float:
+    """Resident memory of `pid` and all its descendants (Linux /proc), in MB. 0 if unknown."""
+    total_kb = 0
+    pending = [pid]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+            for tid in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{tid}/children", "r") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+class PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.navigations = 0
+        self.created_at = time.monotonic()
+        # Origins visited during the current lease, cleared from storage on release.
+        self.origins = set()
+
+
+class BrowserPool:
+    """
+    Bounded pool of reusable Chrome instances with lease/return semantics.
+      - At most `size` browsers exist; callers wait up to `lease_timeout` for one,
+        and at most `max_waiters` may wait (BrowserPoolBusy beyond that).
+      - Every returned browser gets a fresh context: cookies and cache are
+        cleared, storage (localStorage, IndexedDB, service workers, ...) of every
+        origin loaded during the lease is cleared, and it is parked on about:blank.
+      - Idle browsers are health-checked before being leased again.
+      - A browser is recycled after `max_navigations` leases (each call site
+        navigates once per lease) or when its process tree exceeds `max_rss_mb`.
+      - With `block_resources`, BLOCKED_URL_PATTERNS are blocked through CDP.
+    """
+
+    def __init__(self, name: str, arguments=None, user_agent: str = None, size: int = 2,
+                 max_navigations: int = 50, max_rss_mb: float = 1024, lease_timeout: float = 60,
+                 max_waiters: int = None, page_load_strategy: str = "normal", block_resources: bool = False):
+        self.name = name
+        self.arguments = list(arguments or [])
+        self.user_agent = user_agent
+        self.page_load_strategy = page_load_strategy
+        self.block_resources = block_resources
+        self.size = size
+        self.max_navigations = max_navigations
+        self.max_rss_mb = max_rss_mb
+        self.lease_timeout = lease_timeout
+        self.max_waiters = max_waiters
+        self._idle = deque()
+        self._created = 0
+        self._leased = 0
+        self._waiters = 0
+        self._cond = threading.Condition()
+
+    def _create(self) -> PooledBrowser:
+        print(f"[BrowserPool:{self.name}] Launching Chrome...")
+        options = uc.ChromeOptions()
+        for argument in self.arguments:
+            options.add_argument(argument)
+        options.page_load_strategy = self.page_load_strategy
+        if self.block_resources and IMAGES_OFF not in self.arguments:
+            options.add_argument(IMAGES_OFF)
+        driver = uc.Chrome(options=options)
+        if self.user_agent:
+            driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": self.user_agent})
+        if self.block_resources:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        return PooledBrowser(driver)
+
+    @staticmethod
+    def _quit(browser: PooledBrowser):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+        # Prevent driver quit issues
+        uc.Chrome.__del__ = lambda self: None
+
+    @staticmethod
+    def _is_healthy(browser: PooledBrowser) -> bool:
+        try:
+            return browser.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    @staticmethod
+    def _frame_origins(driver) -> set:
+        """Origins of every frame currently loaded (main page and iframes)."""
+        origins = set()
+        pending = [driver.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"]]
+        while pending:
+            node = pending.pop()
+            origin = node["frame"].get("securityOrigin", "")
+            if origin.startswith(("http://", "https://")):
+                origins.add(origin)
+            pending.extend(node.get("childFrames", []))
+        return origins
+
+    def _reset_context(self, browser: PooledBrowser):
+        driver = browser.driver
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        # Storage has to be cleared per origin (CDP has no wildcard), so clear every origin
+        # this lease touched: those recorded at the end of the lease plus what is still loaded.
+        for origin in browser.origins | self._frame_origins(driver):
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        browser.origins.clear()
+        driver.get("about:blank")
+
+    def _should_recycle(self, browser: PooledBrowser) -> bool:
+        if browser.navigations >= self.max_navigations:
+            return True
+        pid = getattr(browser.driver, "browser_pid", None)
+        return bool(pid and self.max_rss_mb and _rss_mb(pid) > self.max_rss_mb)
+
+    def acquire(self, timeout: float = None) -> PooledBrowser:
+        timeout = self.lease_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self.max_waiters is not None and self._waiters >= self.max_waiters and not self._idle \
+                    and self._created >= self.size:
+                raise BrowserPoolBusy(f"Browser pool '{self.name}' queue is full.")
+            self._waiters += 1
+            try:
+                while not self._idle and self._created >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise BrowserPoolTimeout(f"No browser available in pool '{self.name}' after {timeout}s.")
+                    self._cond.wait(remaining)
+                browser = self._idle.popleft() if self._idle else None
+                if browser is None:
+                    self._created += 1
+                self._leased += 1
+            finally:
+                self._waiters -= 1
+
+        try:
+            if browser is not None and not self._is_healthy(browser):
+                print(f"[BrowserPool:{self.name}] Idle browser failed health check, replacing it.")
+                self._quit(browser)
+                browser = None
+            if browser is None:
+                browser = self._create()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._leased -= 1
+                self._cond.notify()
+            raise
+        return browser
+
+    def release(self, browser: PooledBrowser, broken: bool = False):
+        browser.navigations += 1
+        keep = not broken and not self._should_recycle(browser)
+        if keep:
+            try:
+                self._reset_context(browser)
+            except Exception as e:
+                print(f"[BrowserPool:{self.name}] Could not reset browser context: {e}")
+                keep = False
+        if not keep:
+            self._quit(browser)
+        with self._cond:
+            self._leased -= 1
+            if keep:
+                self._idle.append(browser)
+            else:
+                self._created -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        """Yields a WebDriver for the duration of the block and returns it to the pool."""
+        browser = self.acquire(timeout)
+        broken = False
+        try:
+            yield browser.driver
+        except Exception:
+            broken = not self._is_healthy(browser)
+            raise
+        finally:
+            if not broken:
+                self.record_origins(browser)
+            self.release(browser, broken=broken)
+
+    def record_origins(self, browser: PooledBrowser):
+        """Remembers the origins the browser has loaded so release() can clear their storage."""
+        try:
+            browser.origins |= self._frame_origins(browser.driver)
+        except Exception as e:
+            print(f"[BrowserPool:{self.name}] Could not read frame origins: {e}")
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._created -= len(idle)
+        for browser in idle:
+            self._quit(browser)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": len(self._idle),
+                "leased": self._leased,
+                "waiting": self._waiters,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str) -> BrowserPool:
+    """
+    Returns the process-wide pool for a profile in PROFILES.
+    Settings in BROWSER_POOLS (e.g. {"scrape": {"size": 4}}) override the profile.
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            config = {**DEFAULT_SESSION, **PROFILES[name], **get_setting("BROWSER_POOLS", {}).get(name, {})}
+            pool = _pools[name] = BrowserPool(name, **config)
+        return pool
+
+
+def pool_stats() -> dict:
+    """Stats of every pool created so far in this process."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.stats() for name, pool in pools.items()}
+
+
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_all_pools)
@@ -0,0 +1,50 @@
+import time
+
+_RESOURCE_COUNT_JS = "return [document.readyState, performance.getEntriesByType('resource').length];"
+
+
+def wait_for_network_idle(driver, quiet: float = 0.5, timeout: float = 10, poll: float = 0.1) -> bool:
+    """
+    Waits until the document has parsed and no new resource requests have been
+    recorded (Resource Timing API) for `quiet` seconds. Returns False on timeout
+    instead of raising, since the page is usually usable by then anyway.
+    """
+    deadline = time.monotonic() + timeout
+    last_count = None
+    stable_since = time.monotonic()
+    while time.monotonic() < deadline:
+        try:
+            ready_state, count = driver.execute_script(_RESOURCE_COUNT_JS)
+        except Exception:
+            return False
+        now = time.monotonic()
+        if ready_state == "loading" or count != last_count:
+            last_count = count
+            stable_since = now
+        elif now - stable_since >= quiet:
+            return True
+        time.sleep(poll)
+    return False
+
+
+def wait_for_stable_count(driver, css_selector: str, quiet: float = 0.5, timeout: float = 10,
+                          poll: float = 0.1) -> int:
+    """
+    Waits until the number of elements matching `css_selector` stops changing
+    for `quiet` seconds (e.g. lazily appended chapter images). Returns the count.
+    """
+    deadline = time.monotonic() + timeout
+    last_count = -1
+    stable_since = time.monotonic()
+    while time.monotonic() < deadline:
+        count = driver.execute_script(
+            "return document.querySelectorAll(arguments[0]).length;", css_selector
+        )
+        now = time.monotonic()
+        if count != last_count:
+            last_count = count
+            stable_since = now
+        elif count and now - stable_since >= quiet:
+            break
+        time.sleep(poll)
+    return last_count
@@ -0,0 +1,10 @@
+from .source_cache import LRUCache, SourceCache, atomic_write_json, atomic_write_text, atomic_write_bytes, source_cache
+from .singleflight import SingleFlight, scrape_flight
+from .refresh import BackgroundRefresher, file_age, snapshot_refresher
+from .kv_store import SQLiteKVStore
+from .read_index import ReadPathIndex, read_path_index
+from .file_memo import JsonFileMemo, json_file_memo
+from .html_store import HtmlSnapshotStore, html_store
+from .disk_budget import DiskBudget, disk_budget
+from .negative_cache import NegativeCache, negative_cache
+from .answer_cache import ChatAnswerCache, chat_answer_cache
@@ -0,0 +1,45 @@
+from .kv_store import SQLiteKVStore
+from .negative_cache import NegativeCache
+from ..utils.config import get_setting
+
+
+class ChatAnswerCache:
+    """
+    Expiring, size-bounded cache of chatbot answers keyed by the normalized
+    question (case, whitespace and punctuation folded), so repeated questions
+    skip the browser session entirely. "false" (not anime related) answers are
+    cached like any other; callers must not store error messages.
+    """
+
+    DEFAULT_TTL = 24 * 60 * 60
+    DEFAULT_MAX_ENTRIES = 2000
+
+    def __init__(self, store: SQLiteKVStore = None, ttl: float = None, max_entries: int = None):
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.store = store or SQLiteKVStore(
+            "chatbot_answers", default_ttl=self.ttl, max_entries=max_entries or self.DEFAULT_MAX_ENTRIES
+        )
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        return NegativeCache.normalize(message)
+
+    def get(self, message: str):
+        key = self.normalize(message)
+        if not key:
+            return None
+        answer = self.store.get(key)
+        if answer is not None:
+            print(f"[ChatAnswerCache] Hit for {key!r}")
+        return answer
+
+    def put(self, message: str, answer: str):
+        key = self.normalize(message)
+        if key and answer:
+            self.store.put(key, answer)
+
+
+chat_answer_cache = ChatAnswerCache(
+    ttl=get_setting("CHATBOT_ANSWER_CACHE_TTL", None),
+    max_entries=get_setting("CHATBOT_ANSWER_CACHE_SIZE", None),
+)
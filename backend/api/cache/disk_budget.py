@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from .kv_store import connect, default_db_path
+from ..utils.config import get_setting
+
+MB = 1024 * 1024
+
+
+class DiskBudget:
+    """
+    Per-namespace disk budgets (bytes and file count) for the sources/ cache
+    directories, with least-recently-accessed eviction.
+      - Reads and writes of cache files record (path, size, last_access) in an
+        SQLite access log, so eviction never has to scan directories or atimes.
+      - Touches of the same path are throttled to one write per TOUCH_INTERVAL
+        (the throttle map is pruned once it holds MAX_TRACKED paths).
+      - Every EVICT_EVERY writes into a namespace its usage is checked and, if
+        over budget, the oldest entries are removed, along with the snapshot
+        blobs and read-path index rows that only they used.
+      - Snapshot blobs are reference-counted in the same database (see
+        retain_blob/release_blob), so a blob is deleted as soon as its last ref
+        goes, without scanning the ref files.
+    Files written before the log existed are picked up by `rescan()`.
+    """
+
+    BUDGETS = {
+        "detail-page": {"dir": "sources/detail-page", "max_bytes": 512 * MB, "max_files": 20000},
+        "manga-detail-page": {"dir": "sources/manga-detail-page", "max_bytes": 512 * MB, "max_files": 20000},
+        "read-page": {"dir": "sources/read-page", "max_bytes": 256 * MB, "max_files": 50000},
+        "search-page": {"dir": "sources/search-page", "max_bytes": 128 * MB, "max_files": 5000},
+        "home-page-personal": {"dir": "sources/home-page/personal", "max_bytes": 64 * MB, "max_files": 20000},
+        "manga-homepage-personal": {"dir": "sources/manga-homepage/personal", "max_bytes": 64 * MB, "max_files": 20000},
+    }
+    TOUCH_INTERVAL = 60
+    EVICT_EVERY = 100
+    MAX_TRACKED = 10000
+
+    def __init__(self, budgets: dict = None, db_path: str = None):
+        self.budgets = {**self.BUDGETS, **(budgets or {})}
+        self.db_path = db_path or default_db_path()
+        self._dirs = [(os.path.normpath(b["dir"]) + os.sep, name) for name, b in self.budgets.items()]
+        # Longest directory first, so nested namespaces win over their parents.
+        self._dirs.sort(key=lambda item: len(item[0]), reverse=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_touch = {}
+        self._writes = {}
+        self._schema_ready = False
+        self._blob_refs_ready = False
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        if not self._schema_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS disk_access_log ("
+                " path TEXT PRIMARY KEY,"
+                " namespace TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS disk_access_log_lru ON disk_access_log (namespace, last_access)"
+            )
+            self._schema_ready = True
+        return conn
+
+    def namespace_for(self, path: str):
+        normalized = os.path.normpath(path)
+        for prefix, name in self._dirs:
+            if normalized.startswith(prefix):
+                return name
+        return None
+
+    def touch(self, path: str, size: int = None, written: bool = False):
+        """
+        Records an access to `path` (no-op outside budgeted directories).
+        Pass written=True with the new size after writing the file.
+        """
+        namespace = self.namespace_for(path)
+        if namespace is None:
+            return
+        path = os.path.normpath(path)
+        now = time.time()
+        with self._lock:
+            if not written and now - self._last_touch.get(path, 0) < self.TOUCH_INTERVAL:
+                return
+            if len(self._last_touch) >= self.MAX_TRACKED:
+                self._prune_touches(now)
+            self._last_touch[path] = now
+
+        try:
+            if size is None:
+                size = os.path.getsize(path)
+            self._connection().execute(
+                "INSERT INTO disk_access_log (path, namespace, size, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, last_access = excluded.last_access",
+                (path, namespace, size, now),
+            )
+        except OSError:
+            return
+
+        if written:
+            with self._lock:
+                self._writes[namespace] = self._writes.get(namespace, 0) + 1
+                due = self._writes[namespace] % self.EVICT_EVERY == 0
+            if due:
+                self.evict(namespace)
+
+    def _prune_touches(self, now: float):
+        # Entries older than TOUCH_INTERVAL no longer throttle anything; if every
+        # entry is fresh, dropping them all only costs a few extra log writes.
+        fresh = {path: at for path, at in self._last_touch.items() if now - at < self.TOUCH_INTERVAL}
+        self._last_touch = fresh if len(fresh) < self.MAX_TRACKED else {}
+
+    def forget(self, path: str):
+        path = os.path.normpath(path)
+        with self._lock:
+            self._last_touch.pop(path, None)
+        self._connection().execute("DELETE FROM disk_access_log WHERE path = ?", (path,))
+
+    def usage(self, namespace: str) -> tuple:
+        """Returns (bytes, files) recorded for `namespace`."""
+        total, files = self._connection().execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM disk_access_log WHERE namespace = ?", (namespace,)
+        ).fetchone()
+        return total, files
+
+    def evict(self, namespace: str) -> list:
+        """Removes least recently accessed files until `namespace` is within budget."""
+        budget = self.budgets[namespace]
+        total, files = self.usage(namespace)
+        if total <= budget["max_bytes"] and files <= budget["max_files"]:
+            return []
+
+        removed = []
+        blobs = 0
+        rows = self._connection().execute(
+            "SELECT path, size FROM disk_access_log WHERE namespace = ? ORDER BY last_access ASC", (namespace,)
+        )
+        for path, size in rows.fetchall():
+            if total <= budget["max_bytes"] and files <= budget["max_files"]:
+                break
+            if self._remove_file(namespace, path):
+                blobs += 1
+            self.forget(path)
+            total -= size
+            files -= 1
+            removed.append(path)
+        print(f"[DiskBudget] Evicted {len(removed)} file(s) and {blobs} blob(s) from {namespace}.")
+        return removed
+
+    @staticmethod
+    def _remove_file(namespace: str, path: str):
+        """Deletes one cache entry. Returns True if that also freed a snapshot blob."""
+        # Imported lazily: these modules report their accesses to this one.
+        from .html_store import html_store
+        from .read_index import read_path_index
+        from .source_cache import source_cache
+
+        if path.endswith(html_store.REF_SUFFIX):
+            return html_store.delete(path[: -len(html_store.REF_SUFFIX)])
+
+        if namespace == "read-page" and path.endswith(".json"):
+            # Drop the index row too, or lookups would point at the deleted file.
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = None
+            if isinstance(data, dict) and data.get("manga_title") and data.get("chapter"):
+                read_path_index.remove(data["manga_title"], data["chapter"])
+        source_cache.invalidate(namespace, path)
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+
+    @contextmanager
+    def _blob_transaction(self):
+        """
+        Runs a refcount change under SQLite's write lock (BEGIN IMMEDIATE), so a blob
+        cannot be deleted by one worker while another is adding a ref to it.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not self._blob_refs_ready:
+                self._create_blob_refs(conn)
+                self._blob_refs_ready = True
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _create_blob_refs(conn):
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'blob_refs'").fetchone()
+        if exists:
+            return
+        from .html_store import html_store
+
+        conn.execute("CREATE TABLE blob_refs (digest TEXT PRIMARY KEY, refs INTEGER NOT NULL)")
+        # One-off count of the refs written before the table existed.
+        counts = html_store.ref_counts("sources")
+        conn.executemany("INSERT INTO blob_refs (digest, refs) VALUES (?, ?)", counts.items())
+        print(f"[DiskBudget] Counted refs for {len(counts)} existing blob(s).")
+
+    def retain_blob(self, digest: str, ensure_blob):
+        """Counts one more ref to `digest`; `ensure_blob()` must (re)write the blob file if it is missing."""
+        with self._blob_transaction() as conn:
+            conn.execute(
+                "INSERT INTO blob_refs (digest, refs) VALUES (?, 1) "
+                "ON CONFLICT(digest) DO UPDATE SET refs = refs + 1",
+                (digest,),
+            )
+            ensure_blob()
+
+    def release_blob(self, digest: str, remove_blob) -> bool:
+        """
+        Drops one ref to `digest`, calling `remove_blob()` when it was the last one.
+        Blobs without a count (e.g. already removed by html_store.gc()) are left alone.
+        """
+        with self._blob_transaction() as conn:
+            row = conn.execute(
+                "UPDATE blob_refs SET refs = refs - 1 WHERE digest = ? RETURNING refs", (digest,)
+            ).fetchone()
+            if row is None or row[0] > 0:
+                return False
+            conn.execute("DELETE FROM blob_refs WHERE digest = ?", (digest,))
+            remove_blob()
+            return True
+
+    def set_blob_refs(self, counts: dict):
+        """Replaces the blob refcounts, e.g. with the ones html_store.gc() counted."""
+        with self._blob_transaction() as conn:
+            conn.execute("DELETE FROM blob_refs")
+            conn.executemany("INSERT INTO blob_refs (digest, refs) VALUES (?, ?)", counts.items())
+
+    def rescan(self, namespace: str) -> int:
+        """
+        Re-syncs the log with the directory: untracked files are added with their
+        mtime as last access, and rows for files that no longer exist are dropped.
+        """
+        directory = self.budgets[namespace]["dir"]
+        conn = self._connection()
+        tracked = {
+            path for (path,) in conn.execute("SELECT path FROM disk_access_log WHERE namespace = ?", (namespace,))
+        }
+        seen = set()
+        if os.path.isdir(directory):
+            for dirpath, _, files in os.walk(directory):
+                for file in files:
+                    if file.startswith(".tmp-") or file.endswith(".refresh.lock"):
+                        continue
+                    path = os.path.normpath(os.path.join(dirpath, file))
+                    seen.add(path)
+                    if path not in tracked:
+                        stat = os.stat(path)
+                        conn.execute(
+                            "INSERT OR IGNORE INTO disk_access_log (path, namespace, size, last_access) "
+                            "VALUES (?, ?, ?, ?)",
+                            (path, namespace, self._file_size(path, stat.st_size), stat.st_mtime),
+                        )
+        for path in tracked - seen:
+            conn.execute("DELETE FROM disk_access_log WHERE path = ?", (path,))
+        return len(seen)
+
+    @staticmethod
+    def _file_size(path: str, size: int) -> int:
+        from .html_store import html_store
+
+        if path.endswith(html_store.REF_SUFFIX):
+            ref = html_store.read_ref(path[: -len(html_store.REF_SUFFIX)])
+            if ref and os.path.exists(html_store.blob_path(ref["sha256"])):
+                size += os.path.getsize(html_store.blob_path(ref["sha256"]))
+        return size
+
+
+disk_budget = DiskBudget(budgets=get_setting("SOURCE_DISK_BUDGETS", None))
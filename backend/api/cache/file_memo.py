@@ -0,0 +1,41 @@
+import os
+import json
+import threading
+
+
+class JsonFileMemo:
+    """
+    Keeps parsed JSON side-load files in memory and only re-parses a file when
+    its (mtime, size) signature changes, so each request costs a single stat().
+    Returned objects are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str):
+        """
+        Returns the parsed contents of `path`.
+        Raises FileNotFoundError / json.JSONDecodeError like open() + json.load().
+        """
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        key = os.path.normpath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self._entries[key] = (signature, data)
+        return data
+
+    def forget(self, path: str):
+        with self._lock:
+            self._entries.pop(os.path.normpath(path), None)
+
+
+json_file_memo = JsonFileMemo()
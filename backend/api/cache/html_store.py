@@ -0,0 +1,172 @@
+import os
+import gzip
+import json
+import hashlib
+from collections import Counter
+
+from .disk_budget import disk_budget
+from .source_cache import atomic_write_bytes, atomic_write_json
+from ..utils.config import get_setting
+
+
+class HtmlSnapshotStore:
+    """
+    Content-addressed, gzip-compressed storage for the HTML pages scrapers save.
+      - Page bodies live once under `blob_dir`, named by their SHA-256, so
+        identical pages (e.g. the same error page for many titles) are stored once.
+      - The scraper's usual path (e.g. sources/detail-page/one-piece.html) holds a
+        small "<path>.ref" JSON file pointing at the blob.
+      - Plain .html files written before this store existed are still read
+        transparently until `manage.py migrate_html_snapshots` converts them.
+      - Refs also keep the upstream URL, ETag and Last-Modified of the fetch, so a
+        refresh can be a conditional GET (see conditional_headers/save_response).
+      - Blobs are reference-counted through disk_budget: overwriting or deleting
+        the last ref to a blob deletes the blob too.
+    """
+
+    REF_SUFFIX = ".ref"
+
+    def __init__(self, blob_dir: str = None, compresslevel: int = 6):
+        self.blob_dir = blob_dir or get_setting("HTML_SNAPSHOT_DIR", os.path.join("sources", "_blobs"))
+        self.compresslevel = compresslevel
+
+    def ref_path(self, path: str) -> str:
+        return path + self.REF_SUFFIX
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.html.gz")
+
+    def read_ref(self, path: str):
+        """Returns the ref metadata for `path`, or None if it is not in the store."""
+        try:
+            with open(self.ref_path(path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(self.ref_path(path)) or os.path.exists(path)
+
+    def read(self, path: str) -> str:
+        """Returns the decompressed HTML saved for `path`. Raises FileNotFoundError if missing."""
+        ref = self.read_ref(path)
+        if ref is not None:
+            with gzip.open(self.blob_path(ref["sha256"]), "rb") as f:
+                html = f.read().decode("utf-8")
+            disk_budget.touch(self.ref_path(path))
+            return html
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        disk_budget.touch(path)
+        return html
+
+    def save(self, path: str, html: str, **metadata) -> dict:
+        """
+        Stores `html` for `path`, writing the compressed blob only if its content
+        is new. Extra keyword arguments are kept in the ref file. Returns the ref.
+        """
+        body = html.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        blob = self.blob_path(digest)
+
+        def ensure_blob():
+            if not os.path.exists(blob):
+                atomic_write_bytes(blob, gzip.compress(body, compresslevel=self.compresslevel))
+
+        old = self.read_ref(path)
+        if old is not None and old["sha256"] == digest:
+            ensure_blob()
+        else:
+            disk_budget.retain_blob(digest, ensure_blob)
+
+        ref = {"sha256": digest, "size": len(body), **metadata}
+        ref_path = self.ref_path(path)
+        atomic_write_json(ref_path, ref, indent=None)
+        if old is not None and old["sha256"] != digest:
+            self._release(old["sha256"])
+        if os.path.exists(path):
+            # Drop the legacy plain copy so it cannot shadow newer content.
+            os.remove(path)
+            disk_budget.forget(path)
+        disk_budget.touch(ref_path, size=os.path.getsize(ref_path) + os.path.getsize(blob), written=True)
+        return ref
+
+    def conditional_headers(self, path: str) -> dict:
+        """If-None-Match / If-Modified-Since headers for revalidating the snapshot at `path`."""
+        ref = self.read_ref(path) or {}
+        headers = {}
+        if ref.get("etag"):
+            headers["If-None-Match"] = ref["etag"]
+        if ref.get("last_modified"):
+            headers["If-Modified-Since"] = ref["last_modified"]
+        return headers
+
+    def save_response(self, path: str, response, **metadata) -> bool:
+        """
+        Stores an upstream HTTP response for `path` together with its validators.
+        Returns False if the page is unchanged (304, or the same content hash), in
+        which case only the ref's freshness is bumped; True if new content was saved.
+        """
+        ref = self.read_ref(path)
+        if response.status_code == 304 and ref is not None:
+            os.utime(self.ref_path(path))
+            disk_budget.touch(self.ref_path(path))
+            return False
+
+        validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        metadata.update({key: value for key, value in validators.items() if value})
+        new_ref = self.save(path, response.text, **metadata)
+        return ref is None or ref.get("sha256") != new_ref["sha256"]
+
+    def _release(self, digest: str) -> bool:
+        def remove_blob():
+            if os.path.exists(self.blob_path(digest)):
+                os.remove(self.blob_path(digest))
+
+        return disk_budget.release_blob(digest, remove_blob)
+
+    def delete(self, path: str) -> bool:
+        """
+        Removes the ref (and any legacy plain file), and the blob if this was its
+        last ref. Returns True if the blob was removed.
+        """
+        ref = self.read_ref(path)
+        for candidate in (self.ref_path(path), path):
+            if os.path.exists(candidate):
+                os.remove(candidate)
+            disk_budget.forget(candidate)
+        return self._release(ref["sha256"]) if ref else False
+
+    def ref_counts(self, root: str) -> Counter:
+        """Counts the refs under `root` per blob digest (walks the whole tree)."""
+        counts = Counter()
+        for dirpath, _, files in os.walk(root):
+            for file in files:
+                if file.endswith(self.REF_SUFFIX):
+                    ref = self.read_ref(os.path.join(dirpath, file[: -len(self.REF_SUFFIX)]))
+                    if ref:
+                        counts[ref["sha256"]] += 1
+        return counts
+
+    def gc(self, root: str = "sources") -> int:
+        """
+        Deletes blobs no ref under `root` points at. Returns the number removed.
+        With the default root the blob refcounts are reset to what was counted.
+        """
+        counts = self.ref_counts(root)
+        referenced = set(counts)
+        if root == "sources":
+            disk_budget.set_blob_refs(counts)
+        removed = 0
+        for dirpath, _, files in os.walk(self.blob_dir):
+            for file in files:
+                if file.endswith(".html.gz") and file[: -len(".html.gz")] not in referenced:
+                    os.remove(os.path.join(dirpath, file))
+                    removed += 1
+        return removed
+
+
+html_store = HtmlSnapshotStore()
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from ..utils.config import get_setting
+
+_DEFAULT_TTL = object()
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Opens an autocommit SQLite connection in WAL mode, creating the directory if needed."""
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def default_db_path() -> str:
+    return get_setting("SCRAPER_CACHE_DB", os.path.join("sources", "cache.sqlite3"))
+
+
+class SQLiteKVStore:
+    """
+    Keyed JSON store backed by one SQLite table.
+      - WAL mode with a busy timeout, so threads and gunicorn workers can read
+        and write concurrently without losing each other's updates.
+      - Every row carries an optional `expires_at`; reads ignore expired rows
+        and a daemon sweeper deletes them periodically via an index.
+      - `max_entries` (optional) trims the least recently written rows on sweep.
+    Several stores can share a database file by using different table names.
+    """
+
+    def __init__(self, table: str, db_path: str = None, default_ttl: float = None,
+                 sweep_interval: float = 60, max_entries: int = None):
+        if not table.replace("_", "").isalnum():
+            raise ValueError(f"Invalid table name: {table}")
+        self.table = table
+        self.db_path = db_path or default_db_path()
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self._sweeper = None
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                        " key TEXT PRIMARY KEY,"
+                        " value TEXT NOT NULL,"
+                        " expires_at REAL,"
+                        " updated_at REAL NOT NULL)"
+                    )
+                    conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {self.table}_expires_at ON {self.table} (expires_at)"
+                    )
+                    self._schema_ready = True
+        return conn
+
+    def get(self, key: str, default=None):
+        row = self._connection().execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put(self, key: str, value, ttl=_DEFAULT_TTL):
+        """Stores `value` under `key`; `ttl` defaults to default_ttl, and None never expires."""
+        if ttl is _DEFAULT_TTL:
+            ttl = self.default_ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        self._connection().execute(
+            f"INSERT INTO {self.table} (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at, updated_at = excluded.updated_at",
+            (key, json.dumps(value, ensure_ascii=False), expires_at, now),
+        )
+        self._ensure_sweeper()
+
+    def delete(self, key: str):
+        self._connection().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute(f"DELETE FROM {self.table}")
+
+    def count(self) -> int:
+        return self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def sweep(self) -> int:
+        """Deletes expired rows (and rows over max_entries). Returns the number removed."""
+        conn = self._connection()
+        removed = conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+        if self.max_entries:
+            removed += conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        return removed
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None or not self.sweep_interval:
+            return
+        with self._schema_lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(
+                    target=self._sweep_forever, name=f"{self.table}-sweeper", daemon=True
+                )
+                self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"[{self.table}] Swept {removed} entries.")
+            except sqlite3.Error as e:
+                print(f"❌ Sweep of {self.table} failed: {e}")
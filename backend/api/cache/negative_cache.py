@@ -0,0 +1,44 @@
+import re
+
+from .kv_store import SQLiteKVStore
+from ..utils.config import get_setting
+
+
+class NegativeCache:
+    """
+    Shared, expiring record of upstream lookups that found nothing (unknown
+    titles, 404 pages), keyed by kind and normalized query. It lives in the
+    SQLite cache database, so it survives restarts and is shared by all
+    gunicorn workers. Callers check it before any network call.
+    """
+
+    DEFAULT_TTL = 6 * 60 * 60
+
+    def __init__(self, store: SQLiteKVStore = None, ttl: float = None):
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.store = store or SQLiteKVStore("negative_cache", default_ttl=self.ttl)
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case-folds, drops punctuation and collapses whitespace."""
+        folded = re.sub(r"[^\w\s]", " ", (query or "").casefold())
+        return " ".join(folded.split())
+
+    def _key(self, kind: str, query: str) -> str:
+        return f"{kind}|{self.normalize(query)}"
+
+    def is_missing(self, kind: str, query: str) -> bool:
+        entry = self.store.get(self._key(kind, query))
+        if entry is not None:
+            print(f"[NegativeCache] Skipping known miss for {kind}: {query!r} ({entry.get('reason', '')})")
+            return True
+        return False
+
+    def mark_missing(self, kind: str, query: str, reason: str = "", ttl: float = None):
+        self.store.put(self._key(kind, query), {"reason": reason}, ttl=ttl or self.ttl)
+
+    def clear(self, kind: str, query: str):
+        self.store.delete(self._key(kind, query))
+
+
+negative_cache = NegativeCache(ttl=get_setting("NEGATIVE_CACHE_TTL", None))
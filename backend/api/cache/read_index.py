@@ -0,0 +1,60 @@
+import os
+import json
+
+from .kv_store import SQLiteKVStore
+
+
+class ReadPathIndex:
+    """
+    Maps a normalized (manga title, chapter) pair to the read-page cache entry
+    that holds it, so lookups no longer scan and parse every cached chapter.
+    Each value is {"resolved_path": ..., "read_path": ...}, where read_path is
+    the cache file name without ".json".
+    """
+
+    def __init__(self, store: SQLiteKVStore = None):
+        self.store = store or SQLiteKVStore("read_page_index", sweep_interval=0)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join((text or "").lower().split())
+
+    def make_key(self, manga_title: str, chapter: str) -> str:
+        return f"{self.normalize(manga_title)}|{self.normalize(chapter)}"
+
+    def add(self, manga_title: str, chapter: str, resolved_path: str, cache_file: str):
+        read_path = os.path.splitext(os.path.basename(cache_file))[0]
+        self.store.put(
+            self.make_key(manga_title, chapter),
+            {"resolved_path": resolved_path, "read_path": read_path},
+            ttl=None,
+        )
+
+    def lookup(self, manga_title: str, chapter: str):
+        return self.store.get(self.make_key(manga_title, chapter))
+
+    def remove(self, manga_title: str, chapter: str):
+        self.store.delete(self.make_key(manga_title, chapter))
+
+    def rebuild(self, cache_dir: str) -> int:
+        """Re-creates the index from the JSON files in `cache_dir`. Returns the entry count."""
+        self.store.clear()
+        indexed = 0
+        for file in sorted(os.listdir(cache_dir)):
+            if not file.endswith(".json"):
+                continue
+            path = os.path.join(cache_dir, file)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Skipping unreadable cache file {path}: {e}")
+                continue
+            if not isinstance(data, dict) or not data.get("manga_title") or not data.get("chapter"):
+                continue
+            self.add(data["manga_title"], data["chapter"], data.get("resolved_path", ""), path)
+            indexed += 1
+        return indexed
+
+
+read_path_index = ReadPathIndex()
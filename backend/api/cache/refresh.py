@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def file_age(path: str):
+    """Seconds since `path` was last written, or None if it does not exist."""
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class BackgroundRefresher:
+    """
+    Runs snapshot refreshes off the request path for stale-while-revalidate reads.
+      - At most one refresh per key runs in this process at a time.
+      - A lock file next to the snapshot keeps other worker processes from
+        refreshing the same snapshot concurrently.
+      - After an attempt (successful or not) the key is left alone for
+        `retry_interval` seconds, so a failing upstream is not hammered.
+    """
+
+    LOCK_TIMEOUT = 300
+
+    def __init__(self, max_workers: int = 2, retry_interval: float = 60):
+        self.retry_interval = retry_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="snapshot-refresh")
+        self._lock = threading.Lock()
+        self._running = set()
+        self._last_attempt = {}
+
+    def submit(self, key: str, fn, *args, **kwargs) -> bool:
+        """Schedules `fn` unless a refresh for `key` is running or was tried recently."""
+        now = time.monotonic()
+        with self._lock:
+            if key in self._running:
+                return False
+            if now - self._last_attempt.get(key, float("-inf")) < self.retry_interval:
+                return False
+            self._running.add(key)
+            self._last_attempt[key] = now
+        self._executor.submit(self._run, key, fn, args, kwargs)
+        return True
+
+    def _run(self, key, fn, args, kwargs):
+        lock_path = f"{key}.refresh.lock"
+        try:
+            if not self._acquire_file_lock(lock_path):
+                print(f"[Refresh] {key} is being refreshed by another worker.")
+                return
+            try:
+                print(f"[Refresh] Refreshing stale snapshot {key}...")
+                fn(*args, **kwargs)
+                print(f"[Refresh] Snapshot {key} refreshed.")
+            finally:
+                os.remove(lock_path)
+        except Exception as e:
+            print(f"❌ Background refresh of {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(key)
+
+    def _acquire_file_lock(self, lock_path: str) -> bool:
+        age = file_age(lock_path)
+        if age is not None and age > self.LOCK_TIMEOUT:
+            # Left behind by a worker that died mid-refresh.
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+        try:
+            os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+
+
+snapshot_refresher = BackgroundRefresher()
@@ -0,0 +1,60 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller (the leader) runs
+    the function, every caller arriving while it is in flight waits and receives the
+    leader's result (or its exception). Nothing is remembered once the call finishes,
+    so this only collapses concurrent misses; caching the result is up to the caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            print(f"[SingleFlight] Waiting on in-flight call for {key!r}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                print(f"[SingleFlight] Shared result for {key!r} with {call.waiters} waiter(s)")
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# Process-wide group for scrapes that hit upstream sites or launch a browser.
+scrape_flight = SingleFlight()
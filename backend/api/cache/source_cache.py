@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .disk_budget import disk_budget
+from ..utils.config import get_setting
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU mapping where every entry carries its own expiry.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (hit, value). Expired entries are dropped and reported as a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _atomic_write(path: str, write, mode="w"):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        if "b" in mode:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+        else:
+            with os.fdopen(fd, mode, encoding="utf-8") as f:
+                write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_json(path: str, data, indent=4, ensure_ascii=False):
+    """
+    Writes JSON to a temp file next to `path` and renames it into place,
+    so readers never observe a half-written file.
+    """
+    _atomic_write(path, lambda f: json.dump(data, f, indent=indent, ensure_ascii=ensure_ascii))
+
+
+def atomic_write_text(path: str, text: str):
+    """Text counterpart of atomic_write_json."""
+    _atomic_write(path, lambda f: f.write(text))
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """Binary counterpart of atomic_write_json."""
+    _atomic_write(path, lambda f: f.write(data), mode="wb")
+
+
+class SourceCache:
+    """
+    Two-tier cache for the parsed JSON files kept under sources/:
+      - An in-process LRU tier (size-bounded, TTL per namespace).
+      - The existing on-disk JSON files, which remain the source of truth.
+    Entries are keyed by (namespace, path), so the disk layout is unchanged and
+    files written before this cache existed are picked up as ordinary disk hits.
+
+    Dicts are returned as shallow copies: callers may add or replace top-level
+    keys, but nested values are shared with the cache and must not be mutated.
+    """
+
+    DEFAULT_TTL = 300
+    NAMESPACE_TTLS = {
+        "home-page": 600,
+        "home-page-personal": 600,
+        "manga-homepage": 600,
+        "manga-homepage-personal": 600,
+        "detail-page": 3600,
+        "manga-detail-page": 3600,
+        "read-page": 86400,
+    }
+
+    def __init__(self, max_entries: int = 512, namespace_ttls: dict = None):
+        self.memory = LRUCache(max_entries)
+        self.namespace_ttls = {**self.NAMESPACE_TTLS, **(namespace_ttls or {})}
+
+    @staticmethod
+    def _key(namespace: str, path: str) -> tuple:
+        return namespace, os.path.normpath(path)
+
+    @staticmethod
+    def _copy(data):
+        if isinstance(data, dict):
+            return dict(data)
+        if isinstance(data, list):
+            return list(data)
+        return data
+
+    def ttl_for(self, namespace: str) -> float:
+        return self.namespace_ttls.get(namespace, self.DEFAULT_TTL)
+
+    def load_json(self, namespace: str, path: str):
+        """
+        Returns the parsed JSON stored at `path`, or None on a miss.
+        Memory is checked first; on a memory miss the file is read and promoted.
+        A file that is not valid JSON is deleted, so the caller re-scrapes it once.
+        """
+        key = self._key(namespace, path)
+        hit, data = self.memory.get(key)
+        if hit:
+            disk_budget.touch(path)
+            return self._copy(data)
+
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"❌ Corrupt cache file {path}, deleting it: {e}")
+            self.delete(namespace, path)
+            return None
+        except OSError as e:
+            print(f"❌ Failed to read cache file {path}: {e}")
+            return None
+
+        self.memory.set(key, data, self.ttl_for(namespace))
+        disk_budget.touch(path)
+        return self._copy(data)
+
+    def save_json(self, namespace: str, path: str, data, indent=4, ensure_ascii=False):
+        """Writes `data` to disk atomically and refreshes the memory tier."""
+        atomic_write_json(path, data, indent=indent, ensure_ascii=ensure_ascii)
+        self.memory.set(self._key(namespace, path), self._copy(data), self.ttl_for(namespace))
+        disk_budget.touch(path, written=True)
+
+    def touch(self, namespace: str, path: str):
+        """Marks the file at `path` fresh (bumps its mtime) without rewriting it."""
+        if os.path.exists(path):
+            os.utime(path)
+            disk_budget.touch(path)
+
+    def invalidate(self, namespace: str, path: str):
+        """Drops the memory entry only; the file on disk is left alone."""
+        self.memory.delete(self._key(namespace, path))
+
+    def delete(self, namespace: str, path: str):
+        """Drops the memory entry and removes the file on disk."""
+        self.invalidate(namespace, path)
+        if os.path.exists(path):
+            os.remove(path)
+        disk_budget.forget(path)
+
+
+source_cache = SourceCache(
+    max_entries=get_setting("SOURCE_CACHE_MAX_ENTRIES", 512),
+    namespace_ttls=get_setting("SOURCE_CACHE_TTLS", None),
+)
@@ -0,0 +1,95 @@
+import time
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from api.browser import BrowserPool, wait_for_network_idle, wait_for_stable_count
+from api.browser.pool import DEFAULT_SESSION, PROFILES
+
+# name -> (pool profile, default URL, selector the scraper waits for, legacy fixed sleep)
+SCENARIOS = {
+    "read": (
+        "read",
+        "https://mangapark.io/title/10953-en-one-piece/8404558-chapter-1105-the-height-of-folly",
+        'div[data-name="image-show"] img',
+        2,
+    ),
+    "watch": (
+        "scrape",
+        "https://animesugetv.to/watch/one-piece-the-curse-of-the-sacred-sword-kszyl/ep-1",
+        ".server-wrapper",
+        2,
+    ),
+    "search": (
+        "search",
+        "https://animesugetv.to/filter?keyword=one+piece",
+        "form.sorters",
+        1,
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Times browser scrapes with the old session setup (normal page load, no blocking, fixed sleeps) "
+        "against the current one (eager load, blocked resources, explicit waits)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=sorted(SCENARIOS),
+            help="Scenario to run (repeatable). Defaults to all.",
+        )
+        parser.add_argument("--runs", type=int, default=5, help="Timed scrapes per scenario and mode.")
+        parser.add_argument("--url", help="Override the URL (only with a single --scenario).")
+
+    def handle(self, *args, **options):
+        scenarios = options["scenario"] or list(SCENARIOS)
+        if options["url"] and len(scenarios) != 1:
+            raise CommandError("--url needs exactly one --scenario.")
+
+        for name in scenarios:
+            profile, url, selector, legacy_sleep = SCENARIOS[name]
+            url = options["url"] or url
+            results = {}
+            for mode in ("legacy", "tuned"):
+                results[mode] = self.time_scenario(profile, mode, url, selector, legacy_sleep, options["runs"])
+
+            legacy, tuned = statistics.median(results["legacy"]), statistics.median(results["tuned"])
+            self.stdout.write(
+                f"{name:<7} legacy median {legacy:6.2f}s  tuned median {tuned:6.2f}s  "
+                f"({(1 - tuned / legacy) * 100:+.0f}% faster)" if legacy else f"{name}: no timings"
+            )
+
+    def time_scenario(self, profile, mode, url, selector, legacy_sleep, runs):
+        config = {**DEFAULT_SESSION, **PROFILES[profile], "size": 1}
+        if mode == "legacy":
+            config.update(page_load_strategy="normal", block_resources=False)
+        pool = BrowserPool(f"bench-{profile}-{mode}", **config)
+        timings = []
+        try:
+            # Warm-up lease so Chrome start-up is not part of the timings.
+            with pool.lease() as driver:
+                driver.get("about:blank")
+            for run in range(runs):
+                with pool.lease() as driver:
+                    start = time.perf_counter()
+                    driver.get(url)
+                    WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+                    if mode == "legacy":
+                        time.sleep(legacy_sleep)
+                    elif profile == "read":
+                        wait_for_stable_count(driver, selector)
+                    elif profile == "search":
+                        wait_for_network_idle(driver, timeout=5)
+                    elapsed = time.perf_counter() - start
+                timings.append(elapsed)
+                self.stdout.write(f"  {profile}/{mode} run {run + 1}: {elapsed:.2f}s")
+        finally:
+            pool.close()
+        return timings
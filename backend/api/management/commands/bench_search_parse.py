@@ -0,0 +1,79 @@
+import io
+import os
+import time
+import statistics
+from contextlib import redirect_stdout
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import html_store
+from api.pages.search_page import SearchPage
+
+FIXTURE_DIR = os.path.join("sources", "search-page")
+PAGE1_SUFFIX = "_page1.html"
+
+
+class Command(BaseCommand):
+    help = (
+        "Times parsing of the cached search page-1 fixtures: the old flow (a separate BeautifulSoup "
+        "tree for filters, two pagination reads and cards) against the parse-once pipeline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=20, help="Timed parses per fixture and mode.")
+        parser.add_argument("--dir", default=FIXTURE_DIR, help="Directory holding *_page1.html snapshots.")
+
+    def handle(self, *args, **options):
+        # Snapshots are either plain files or html_store refs (<name>.ref).
+        names = os.listdir(options["dir"]) if os.path.isdir(options["dir"]) else []
+        fixtures = sorted({
+            os.path.join(options["dir"], name.removesuffix(html_store.REF_SUFFIX))
+            for name in names
+            if name.removesuffix(html_store.REF_SUFFIX).endswith(PAGE1_SUFFIX)
+        })
+        if not fixtures:
+            raise CommandError(f"No *{PAGE1_SUFFIX} fixtures in {options['dir']}.")
+
+        page = SearchPage("bench")
+        totals = {"legacy": [], "pipeline": []}
+        for path in fixtures:
+            html = html_store.read(path)
+            with redirect_stdout(io.StringIO()):
+                legacy_result = self.legacy_parse(page, html)
+                pipeline_result = page.parse_page(html, page=1)
+            if legacy_result != pipeline_result:
+                raise CommandError(f"{path}: pipeline output differs from the old flow.")
+
+            results = {"legacy": [], "pipeline": []}
+            for _ in range(options["runs"]):
+                with redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    self.legacy_parse(page, html)
+                    results["legacy"].append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    page.parse_page(html, page=1)
+                    results["pipeline"].append(time.perf_counter() - start)
+
+            legacy, pipeline = statistics.median(results["legacy"]), statistics.median(results["pipeline"])
+            totals["legacy"].append(legacy)
+            totals["pipeline"].append(pipeline)
+            self.stdout.write(
+                f"{os.path.basename(path):<40} legacy {legacy * 1000:7.1f} ms  pipeline {pipeline * 1000:7.1f} ms  "
+                f"({(1 - pipeline / legacy) * 100:.0f}% less, {len(pipeline_result['cards'])} cards)"
+            )
+
+        legacy, pipeline = sum(totals["legacy"]), sum(totals["pipeline"])
+        self.stdout.write(
+            f"{'all fixtures':<40} legacy {legacy * 1000:7.1f} ms  pipeline {pipeline * 1000:7.1f} ms  "
+            f"saved {(legacy - pipeline) * 1000:.1f} ms"
+        )
+
+    @staticmethod
+    def legacy_parse(page, html):
+        # The old get_search_results: filters and pagination from the page-1 HTML, then
+        # fetch_all_cards re-read the pagination and parsed the (re-downloaded) page 1 again.
+        filters = page.fetch_filters(html)
+        page.get_last_page_no(html)
+        last_page = page.get_last_page_no(html)
+        cards = page.fetch_cards_from_html(html)
+        return {"filters": filters, "last_page": last_page, "cards": cards}
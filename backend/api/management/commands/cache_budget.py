@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import disk_budget, html_store
+
+
+class Command(BaseCommand):
+    help = "Reports disk usage of the sources/ cache namespaces and optionally evicts them down to budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--namespace",
+            action="append",
+            help="Namespace to process (repeatable). Defaults to every budgeted namespace.",
+        )
+        parser.add_argument(
+            "--rescan",
+            action="store_true",
+            help="Sync the access log with the directories first (picks up files written before it existed).",
+        )
+        parser.add_argument("--evict", action="store_true", help="Evict least recently used files down to budget.")
+
+    def handle(self, *args, **options):
+        namespaces = options["namespace"] or list(disk_budget.budgets)
+        unknown = [name for name in namespaces if name not in disk_budget.budgets]
+        if unknown:
+            raise CommandError(f"Unknown namespace(s): {', '.join(unknown)}")
+
+        for namespace in namespaces:
+            if options["rescan"]:
+                disk_budget.rescan(namespace)
+            if options["evict"]:
+                removed = disk_budget.evict(namespace)
+                if removed:
+                    self.stdout.write(f"{namespace}: evicted {len(removed)} file(s)")
+
+            budget = disk_budget.budgets[namespace]
+            total, files = disk_budget.usage(namespace)
+            over = total > budget["max_bytes"] or files > budget["max_files"]
+            line = (
+                f"{namespace:<26} {total / 1024 / 1024:>9.1f} MB / {budget['max_bytes'] / 1024 / 1024:.0f} MB"
+                f"  {files:>6} / {budget['max_files']} files"
+            )
+            self.stdout.write(self.style.WARNING(line + "  OVER BUDGET") if over else line)
+
+        if options["evict"]:
+            reclaimed = html_store.gc()
+            self.stdout.write(self.style.SUCCESS(f"Removed {reclaimed} unreferenced HTML blob(s)."))
@@ -0,0 +1,61 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from api.cache import html_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves plain .html snapshots under sources/ into the compressed, "
+        "content-addressed snapshot store and removes unreferenced blobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--root", default="sources", help="Directory to scan for .html files.")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be migrated.",
+        )
+
+    def handle(self, *args, **options):
+        root = options["root"]
+        dry_run = options["dry_run"]
+        blob_dir = os.path.abspath(html_store.blob_dir)
+
+        migrated = 0
+        plain_bytes = 0
+        for dirpath, _, files in os.walk(root):
+            if os.path.abspath(dirpath).startswith(blob_dir):
+                continue
+            for file in sorted(files):
+                if not file.endswith(".html"):
+                    continue
+                path = os.path.join(dirpath, file)
+                plain_bytes += os.path.getsize(path)
+                migrated += 1
+                if dry_run:
+                    self.stdout.write(f"Would migrate {path}")
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    html = f.read()
+                # save() writes the blob and ref, then removes the plain file.
+                html_store.save(path, html)
+
+        if dry_run:
+            self.stdout.write(f"{migrated} file(s), {plain_bytes} bytes would be migrated.")
+            return
+
+        removed = html_store.gc(root)
+        blob_bytes = sum(
+            os.path.getsize(os.path.join(dirpath, file))
+            for dirpath, _, files in os.walk(html_store.blob_dir)
+            for file in files
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Migrated {migrated} file(s): {plain_bytes} plain bytes -> "
+                f"{blob_bytes} bytes in {html_store.blob_dir} ({removed} orphaned blob(s) removed)."
+            )
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import read_path_index
+from api.pages.read_page import ReadPage
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the (manga title, chapter) -> read path index from sources/read-page."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cache-dir",
+            default=ReadPage.CACHE_DIR,
+            help="Directory holding the read-page JSON cache files.",
+        )
+
+    def handle(self, *args, **options):
+        indexed = read_path_index.rebuild(options["cache_dir"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} read-page cache entries."))
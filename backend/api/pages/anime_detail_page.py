@@ -1,8 +1,12 @@
 import os
 import json
-import requests
 from bs4 import BeautifulSoup
 
+from api.cache import source_cache, scrape_flight, json_file_memo, html_store, negative_cache
+from api.cache import snapshot_refresher, file_age
+from api.utils.config import get_setting
+from api.utils.http import http_client
+
 
 class AnimeDetailPage:
     """
@@ -14,7 +18,8 @@ class AnimeDetailPage:
     """
 
     DEFAULT_URL = "https://kaido.to/the-last-naruto-the-movie-882"
-    INVALID_PATHS = set()
+    # Snapshots older than this are still served, but trigger a background revalidation.
+    SOFT_TTL = get_setting("DETAIL_PAGE_SOFT_TTL", 24 * 60 * 60)
 
     def __init__(self, base_url: str = None):
         self.base_url = base_url or self.DEFAULT_URL
@@ -48,16 +53,38 @@ class AnimeDetailPage:
         Fetch the HTML content from the URL if the file does not already exist.
         """
         base_filename = self.get_base_filename(url)
-        if base_filename in self.INVALID_PATHS:
-            print(f"Skipping fetch for invalid path: {base_filename}")
+        if negative_cache.is_missing("kaido-detail", base_filename):
             return
 
-        if not os.path.exists(file_path):
-            response = requests.get(url)
-            response.raise_for_status()
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "w", encoding="utf-8") as file:
-                file.write(response.text)
+        if not html_store.exists(file_path):
+            # Concurrent misses for the same page share a single download.
+            scrape_flight.do(("detail-html", file_path), self._download_html, file_path, url)
+
+    @staticmethod
+    def _download_html(file_path: str, url: str) -> None:
+        if html_store.exists(file_path):
+            return
+        response = http_client.get(url)
+        if response.status_code == 404:
+            # Remember the bad path so repeated requests skip the upstream.
+            negative_cache.mark_missing("kaido-detail", AnimeDetailPage.get_base_filename(url), "404")
+        response.raise_for_status()
+        html_store.save_response(file_path, response, url=url)
+
+    def refresh_snapshot(self, html_file_path: str, json_file_path: str, url: str) -> None:
+        """
+        Revalidates a detail page with a conditional GET. Only a changed page is
+        re-parsed and re-serialized; otherwise the JSON snapshot is just marked fresh.
+        """
+        response = http_client.get(url, headers=html_store.conditional_headers(html_file_path))
+        response.raise_for_status()
+        if not html_store.save_response(html_file_path, response, url=url):
+            print(f"[AnimeDetail] {url} unchanged upstream, keeping the snapshot.")
+            source_cache.touch("detail-page", json_file_path)
+            return
+        data = self.parse_kaidoto_detail_page(html_file_path)
+        if "error" not in data:
+            source_cache.save_json("detail-page", json_file_path, data)
 
     @staticmethod
     def extract_film_stats(tick_div) -> dict:
@@ -115,12 +142,11 @@ class AnimeDetailPage:
         """
         Parses the HTML file and returns a dictionary with anime details.
         """
-        if not os.path.exists(file_path):
+        if not html_store.exists(file_path):
             print(f"File not found: {file_path}")
             return {"error": "Invalid anime page or file does not exist."}
 
-        with open(file_path, "r", encoding="utf-8") as file:
-            soup = BeautifulSoup(file, "lxml")
+        soup = BeautifulSoup(html_store.read(file_path), "lxml")
 
         anime_data = {}
 
@@ -301,11 +327,11 @@ class AnimeDetailPage:
         anime_data = {}
 
         try:
-            with open("sources/most_popular_anime.json", "r", encoding="utf-8") as file:
-                data = json.load(file)
-                most_popular = data.get("most_popular_anime", [])
-                anime_data["most_popular_anime"] = most_popular
-                return anime_data
+            # Parsed once and reused until the file changes on disk.
+            data = json_file_memo.load("sources/most_popular_anime.json")
+            most_popular = data.get("most_popular_anime", [])
+            anime_data["most_popular_anime"] = most_popular
+            return anime_data
         except FileNotFoundError:
             print("❌ File not found: sources/most_popular_anime.json")
         except json.JSONDecodeError:
@@ -326,15 +352,24 @@ class AnimeDetailPage:
         target_url = f"https://kaido.to{pathname}" if pathname else self.base_url
         html_file_path, json_file_path = self.get_file_paths(target_url)
 
-        if os.path.exists(json_file_path):
-            with open(json_file_path, "r", encoding="utf-8") as json_file:
-                data = json.load(json_file)
+        data = source_cache.load_json("detail-page", json_file_path)
+        if data is not None and "error" in data:
+            # Error results are never a valid snapshot (older builds saved some).
+            source_cache.delete("detail-page", json_file_path)
+            data = None
+        if data is not None:
+            age = file_age(json_file_path)
+            if age is not None and age > self.SOFT_TTL:
+                snapshot_refresher.submit(
+                    json_file_path, self.refresh_snapshot, html_file_path, json_file_path, target_url
+                )
         else:
             self.fetch_html_if_not_exists(html_file_path, target_url)
             data = self.parse_kaidoto_detail_page(html_file_path)
-            os.makedirs(os.path.dirname(json_file_path), exist_ok=True)
-            with open(json_file_path, "w", encoding="utf-8") as json_file:
-                json.dump(data, json_file, indent=4, ensure_ascii=False)
+            # Only real pages are persisted; a (negatively cached) missing page
+            # must be re-checked once its negative entry expires.
+            if "error" not in data:
+                source_cache.save_json("detail-page", json_file_path, data)
 
         # Append most popular anime data
         most_popular_data = AnimeDetailPage.load_most_popular_anime()
@@ -0,0 +1,281 @@
+import time
+import threading
+from abc import ABC, abstractmethod
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from api.browser import admission, get_pool
+from api.utils.config import get_setting
+
+ANIME_INSTRUCTION = (
+    ". Check given question is anime related or not. "
+    "If it is not, answer ONLY with the single word 'false'. Otherwise, answer the question normally."
+)
+
+
+def build_prompt(message):
+    return f"Question=> '{message}'" + ANIME_INSTRUCTION
+
+
+class Replace(str):
+    """
+    A stream event carrying the whole answer so far, to be shown instead of
+    everything streamed before it (e.g. after the page re-rendered the answer).
+    """
+
+
+def apply_chunk(text, chunk):
+    """Returns the answer text after one stream event: a delta is appended, a Replace replaces it."""
+    return str(chunk) if isinstance(chunk, Replace) else text + chunk
+
+
+def recorded(stream, parts):
+    """Re-yields the deltas of an engine stream, appending them to `parts`, and returns its result."""
+    try:
+        while True:
+            try:
+                delta = next(stream)
+            except StopIteration as stop:
+                return stop.value
+            parts.append(delta)
+            yield delta
+    finally:
+        stream.close()
+
+
+class ChatbotEngine(ABC):
+    """
+    Produces a chatbot answer as a stream of text deltas (or Replace events).
+    `stream()` is a generator that returns True once the answer is complete
+    (False if it was cut short) and raises on failure.
+    """
+
+    name = "base"
+    # Whether answering takes a browser (and so an admission slot).
+    needs_browser = False
+    # Whether complete answers may go into the shared answer cache.
+    cacheable = True
+
+    def available(self):
+        return True
+
+    @abstractmethod
+    def stream(self, message):
+        """Yields the answer's text deltas; returns True if it is complete."""
+
+
+class ChatGPTSession:
+    """One question asked on chatgpt.com through a leased browser."""
+
+    def __init__(self, driver, url, timeout):
+        self.driver = driver
+        self.url = url
+        self.timeout = timeout
+        self.wait = WebDriverWait(self.driver, 30)
+
+    def open_website(self):
+        print("[INFO] Opening ChatGPT website...")
+        self.driver.get(self.url)
+
+    def wait_for_element(self, by, identifier):
+        print(f"[INFO] Waiting for element {identifier} to be visible...")
+        element = self.wait.until(EC.visibility_of_element_located((by, identifier)))
+        self.driver.execute_script("arguments[0].scrollIntoView();", element)
+        print(f"[INFO] Element {identifier} is visible.")
+        return element
+
+    def send_message(self, message):
+        input_box = self.wait_for_element(By.ID, "prompt-textarea")
+        print("[INFO] Clicking to focus on the input box...")
+        input_box.click()
+
+        final_message = build_prompt(message)
+        print(f"[INFO] Typing final message: '{final_message}'")
+        input_box.send_keys(final_message)
+        print("[INFO] Message typed in the contenteditable input.")
+
+        print("[INFO] Waiting for the send button to be clickable...")
+        send_button = self.wait.until(
+            EC.element_to_be_clickable((By.XPATH, "(//button[@aria-label='Send prompt'])[1]"))
+        )
+        print("[INFO] Found send button. Clicking it to send the message...")
+        send_button.click()
+        print("[INFO] Message sent. Streaming assistant response...\n")
+
+    def poll_response(self):
+        """
+        Yields text deltas as the answer renders; returns True once it is complete.
+        A change that does not extend the text already sent (a re-render) is
+        yielded as a Replace carrying the full text.
+        """
+        assistant_xpath = "//div[@data-message-author-role='assistant']//div[contains(@class, 'markdown')]"
+        printed_text = ""
+        start_time = time.time()
+        last_change_time = time.time()
+
+        while time.time() - start_time < self.timeout:
+            try:
+                element = self.driver.find_element(By.XPATH, assistant_xpath)
+                current_text = element.text
+            except Exception:
+                current_text = printed_text
+
+            if current_text != printed_text:
+                if current_text.startswith(printed_text):
+                    delta = current_text[len(printed_text):]
+                    yield delta if printed_text else delta.lstrip()
+                else:
+                    yield Replace(current_text.lstrip())
+                printed_text = current_text
+                last_change_time = time.time()
+            else:
+                # Done once the answer has started and stopped changing for a second.
+                if printed_text and time.time() - last_change_time >= 1:
+                    return True
+
+            time.sleep(0.05)
+        # Timed out while the answer was still changing (or never started).
+        return False
+
+
+class SeleniumEngine(ChatbotEngine):
+    """Asks chatgpt.com in a pooled headless browser and streams what the page renders."""
+
+    name = "selenium"
+    needs_browser = True
+
+    def __init__(self, url="https://chatgpt.com/", timeout=90):
+        self.url = url
+        self.timeout = timeout
+
+    def stream(self, message):
+        with get_pool("chatbot").lease() as driver:
+            print("[INFO] Leased ChromeDriver from the pool.")
+            session = ChatGPTSession(driver, self.url, self.timeout)
+            session.open_website()
+            session.send_message(message)
+            return (yield from session.poll_response())
+
+
+class GeminiEngine(ChatbotEngine):
+    """
+    Streams tokens from the Gemini API. One client is configured per process and
+    reused; google-generativeai is imported only when the engine is first used.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key=None, model_name=None, timeout=60):
+        self.api_key = api_key or get_setting("GEMINI_API_KEY", "")
+        self.model_name = model_name or get_setting("GEMINI_MODEL", "gemini-1.5-flash")
+        self.timeout = timeout
+        self._model = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        if not self.api_key:
+            return False
+        try:
+            import google.generativeai  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _client(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+                    print(f"[INFO] Gemini client ready ({self.model_name}).")
+        return self._model
+
+    def stream(self, message):
+        response = self._client().generate_content(
+            build_prompt(message), stream=True, request_options={"timeout": self.timeout}
+        )
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata) raise on .text.
+                continue
+            if text:
+                yield text
+        return True
+
+
+class StubEngine(ChatbotEngine):
+    """Canned, locally generated answers for load-testing the endpoint offline."""
+
+    name = "stub"
+    cacheable = False
+
+    def __init__(self, delay=None):
+        self.delay = get_setting("CHATBOT_STUB_DELAY", 0.02) if delay is None else delay
+
+    def stream(self, message):
+        answer = f"This is a stub answer to: {message.strip()}. No model was called."
+        for word in answer.split(" "):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word + " "
+        return True
+
+
+class FallbackEngine(ChatbotEngine):
+    """Uses `primary`, switching to `fallback` if it fails before producing any text."""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+        self.needs_browser = primary.needs_browser
+        self.cacheable = primary.cacheable and fallback.cacheable
+
+    def stream(self, message):
+        parts = []
+        try:
+            return (yield from recorded(self.primary.stream(message), parts))
+        except Exception as e:
+            if parts:
+                raise
+            print(f"[WARN] {self.primary.name} engine failed ({e}), falling back to {self.fallback.name}.")
+        if self.fallback.needs_browser and not self.needs_browser:
+            # The endpoint did not take an admission slot for this engine, so take one here.
+            with admission.slot("chatbot"):
+                return (yield from self.fallback.stream(message))
+        return (yield from self.fallback.stream(message))
+
+
+ENGINES = {
+    "selenium": SeleniumEngine,
+    "gemini": GeminiEngine,
+    "stub": StubEngine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name=None):
+    """
+    Returns the process-wide engine named by CHATBOT_ENGINE ("gemini", "selenium" or "stub").
+    Gemini falls back to Selenium per request on errors, and entirely when no API key
+    or client library is available.
+    """
+    name = name or get_setting("CHATBOT_ENGINE", "selenium")
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            engine = ENGINES[name]()
+            if name == "gemini":
+                if engine.available():
+                    engine = FallbackEngine(engine, SeleniumEngine())
+                else:
+                    print("[WARN] Gemini engine unavailable (no GEMINI_API_KEY or client library); using Selenium.")
+                    engine = SeleniumEngine()
+            _engines[name] = engine
+        return engine
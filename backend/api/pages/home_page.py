@@ -5,6 +5,10 @@ import requests
 from bs4 import BeautifulSoup
 from collections import Counter
 from api.models import WatchHistory
+from api.cache import source_cache, snapshot_refresher, file_age, html_store
+from api.utils.config import get_setting
+from api.utils.http import http_client
+from api.utils.upstream import UpstreamUnavailable
 
 class HomePage:
     TYPE_MAPPING = {
@@ -66,44 +70,64 @@ class HomePage:
         self.html_path = os.path.join("sources", "home-page", "homepage.html")
         self.json_path = os.path.join("sources", "home-page", "homepage.json")
         self.personal_dir = os.path.join("sources", "home-page", "personal")
+        # Snapshots older than this are still served, but trigger a background refresh.
+        self.soft_ttl = get_setting("HOMEPAGE_SOFT_TTL", 6 * 60 * 60)
 
     def get_homepage_data(self, request=None):
         """
-        Returns structured homepage data.
-        If a JSON cache exists, load and return it.
+        Returns structured homepage data (stale-while-revalidate).
+        If a JSON snapshot exists, return it immediately; when it is older than
+        the soft TTL, a single background refresh re-fetches and swaps it.
         Else, if an HTML cache exists, parse it.
         Otherwise, fetch the HTML from the homepage, save it, parse it,
         cache the parsed data as JSON, and return the result.
         """
         # Load cached JSON data or fetch from HTML
-        if os.path.exists(self.json_path):
-            with open(self.json_path, "r", encoding="utf-8") as jf:
-                data = json.load(jf)
+        data = source_cache.load_json("home-page", self.json_path)
+        if data is not None:
+            age = file_age(self.json_path)
+            if age is not None and age > self.soft_ttl:
+                snapshot_refresher.submit(self.json_path, self.refresh_snapshot)
+            return data
+
+        if html_store.exists(self.html_path):
+            data = self._parse_homepage(self.html_path)
         else:
-            if os.path.exists(self.html_path):
-                data = self._parse_homepage(self.html_path)
-            else:
-                try:
-                    response = requests.get(self.homepage_url)
-                    response.raise_for_status()  # Check if the request was successful
-                    os.makedirs(os.path.dirname(self.html_path), exist_ok=True)
-                    with open(self.html_path, "w", encoding="utf-8") as html_file:
-                        html_file.write(response.text)
-                    data = self._parse_homepage(self.html_path)
-                except requests.exceptions.RequestException as e:
-                    raise Exception("Error fetching homepage data: " + str(e))
-
-            # Cache the parsed data as JSON
-            os.makedirs(os.path.dirname(self.json_path), exist_ok=True)
-            with open(self.json_path, "w", encoding="utf-8") as jf:
-                json.dump(data, jf, indent=4, ensure_ascii=False)
+            self._fetch_homepage_html()
+            data = self._parse_homepage(self.html_path)
 
+        # Cache the parsed data as JSON
+        source_cache.save_json("home-page", self.json_path, data)
         return data
 
+    def refresh_snapshot(self):
+        """
+        Revalidates the homepage with a conditional GET. Only a changed page is
+        re-parsed and replaces the JSON snapshot; otherwise the snapshot is marked fresh.
+        """
+        if not self._fetch_homepage_html(revalidate=True):
+            print("[HomePage] Homepage unchanged upstream, keeping the snapshot.")
+            source_cache.touch("home-page", self.json_path)
+            return
+        data = self._parse_homepage(self.html_path)
+        source_cache.save_json("home-page", self.json_path, data)
+
+    def _fetch_homepage_html(self, revalidate=False):
+        """Saves the homepage HTML. Returns False if revalidation found it unchanged."""
+        headers = html_store.conditional_headers(self.html_path) if revalidate else {}
+        try:
+            response = http_client.get(self.homepage_url, headers=headers)
+            response.raise_for_status()  # Check if the request was successful
+        except UpstreamUnavailable:
+            # Left as is so the API answers 503 with Retry-After.
+            raise
+        except requests.exceptions.RequestException as e:
+            raise Exception("Error fetching homepage data: " + str(e))
+        return html_store.save_response(self.html_path, response, url=self.homepage_url)
+
     def _parse_homepage(self, file_path):
-        """Reads the HTML from file_path, parses it with BeautifulSoup, and returns a structured dictionary."""
-        with open(file_path, "r", encoding="utf-8") as f:
-            html = f.read()
+        """Reads the HTML snapshot for file_path, parses it with BeautifulSoup, and returns a structured dictionary."""
+        html = html_store.read(file_path)
         soup = BeautifulSoup(html, "html.parser")
         data = {
             "image_slider": self._parse_image_slider(soup),
@@ -154,7 +178,7 @@ class HomePage:
         qs_str = "&".join(f"{k}={v}" for k, v in params.items())
         url    = f"https://kaido.to/filter?{qs_str}"
 
-        resp = requests.get(url, timeout=5)
+        resp = http_client.get(url, timeout=5)
         resp.raise_for_status()
         soup = BeautifulSoup(resp.text, "html.parser")
 
@@ -219,14 +243,11 @@ class HomePage:
             os.makedirs(self.personal_dir, exist_ok=True)
             personal_path = os.path.join(self.personal_dir, f"{user.username}.json")
 
-            if os.path.exists(personal_path):
-                with open(personal_path, "r", encoding="utf-8") as pf:
-                    recs = json.load(pf)
-            else:
+            recs = source_cache.load_json("home-page-personal", personal_path)
+            if recs is None:
                 recs = self._get_personal_recommendations(user)
                 # Cache recommendations even if empty to avoid recomputing every time
-                with open(personal_path, "w", encoding="utf-8") as pf:
-                    json.dump(recs, pf, indent=4, ensure_ascii=False)
+                source_cache.save_json("home-page-personal", personal_path, recs)
 
             if recs:
                return recs
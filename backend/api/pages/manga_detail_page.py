@@ -1,10 +1,13 @@
 import os
 import sys
 import json
-import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, unquote, urlparse, unquote_plus
 
+from api.cache import source_cache, json_file_memo, html_store, negative_cache, snapshot_refresher, file_age
+from api.utils.config import get_setting
+from api.utils.http import http_client
+
 def clean_text(text):
     return " ".join(text.strip().split())
 
@@ -25,6 +28,8 @@ class MangaDetailPage:
     BASE_URL = "https://mangapark.io"  # Base URL used for search and detail pages.
     SEARCH_URL = f"{BASE_URL}/search"
     HEADERS = {"User-Agent": "Mozilla/5.0"}
+    # Snapshots older than this are still served, but trigger a background revalidation.
+    SOFT_TTL = get_setting("MANGA_DETAIL_SOFT_TTL", 24 * 60 * 60)
     
     def __init__(self, manga_title):
         # Decode URL encoded title (if any) and standardize by lower-casing.
@@ -40,9 +45,12 @@ class MangaDetailPage:
     def search_manga(self):
         """
         Searches MangaPark for the given manga title and returns the first result's detail page URL.
+        Titles with no results are remembered in the negative cache and not searched again until it expires.
         """
+        if negative_cache.is_missing("mangapark-search", self.manga_title):
+            return None
         try:
-            response = requests.get(self.SEARCH_URL, params={"word": self.manga_title}, headers=self.HEADERS, timeout=10)
+            response = http_client.get(self.SEARCH_URL, params={"word": self.manga_title}, headers=self.HEADERS, timeout=10)
             response.raise_for_status()
         except Exception as e:
             print(f"❌ Search request failed: {e}")
@@ -52,11 +60,13 @@ class MangaDetailPage:
         first_card = soup.select_one("div[q\\:key='q4_9']")
         if not first_card:
             print("❌ No manga search result found.")
+            negative_cache.mark_missing("mangapark-search", self.manga_title, "no search result")
             return None
 
         link_tag = first_card.select_one("h3[q\\:key='o2_2'] a[href]")
         if not link_tag:
             print("❌ No manga link found in result card.")
+            negative_cache.mark_missing("mangapark-search", self.manga_title, "no link in result card")
             return None
 
         detail_url = urljoin(self.BASE_URL, link_tag["href"])
@@ -68,10 +78,9 @@ class MangaDetailPage:
         Fetches HTML from the given URL and saves it to the specified path.
         """
         try:
-            response = requests.get(url, headers=self.HEADERS)
+            response = http_client.get(url, headers=self.HEADERS)
             if response.status_code == 200:
-                with open(save_path, "w", encoding="utf-8") as file:
-                    file.write(response.text)
+                html_store.save_response(save_path, response, url=url)
                 print(f"HTML successfully saved to {save_path}")
                 return True
             else:
@@ -87,8 +96,7 @@ class MangaDetailPage:
         Returns a dictionary containing various details.
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
+            html_content = html_store.read(file_path)
             soup = BeautifulSoup(html_content, 'html.parser')
 
             container = soup.find("div", attrs={"q:key": "g0_12"})
@@ -199,8 +207,7 @@ class MangaDetailPage:
         Only includes chapters whose URLs start with "{BASE_URL}/title/".
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                html_content = file.read()
+            html_content = html_store.read(file_path)
             soup = BeautifulSoup(html_content, 'html.parser')
             chapter_list_div = soup.find('div', {'data-name': 'chapter-list'})
             if chapter_list_div:
@@ -226,17 +233,42 @@ class MangaDetailPage:
         """
         Loads homepage data (if available) from a common JSON file.
         """
-        if os.path.exists(self.HOMEPAGE_JSON_PATH):
-            try:
-                with open(self.HOMEPAGE_JSON_PATH, "r", encoding="utf-8") as file:
-                    homepage_data = json.load(file)
-                return homepage_data
-            except Exception as e:
-                print(f"Error reading homepage data: {e}")
-                return {}
-        else:
+        try:
+            # Parsed once and reused until the file changes on disk.
+            return json_file_memo.load(self.HOMEPAGE_JSON_PATH)
+        except FileNotFoundError:
             print(f"Homepage JSON file not found: {self.HOMEPAGE_JSON_PATH}")
             return {}
+        except Exception as e:
+            print(f"Error reading homepage data: {e}")
+            return {}
+
+    def refresh_snapshot(self):
+        """
+        Revalidates the detail page with a conditional GET (URL taken from the snapshot ref).
+        Only a changed page is re-parsed and re-serialized; otherwise the JSON is marked fresh.
+        """
+        ref = html_store.read_ref(self.DETAIL_HTML_PATH) or {}
+        detail_url = ref.get("url") or self.search_manga()
+        if not detail_url:
+            return
+        headers = {**self.HEADERS, **html_store.conditional_headers(self.DETAIL_HTML_PATH)}
+        response = http_client.get(detail_url, headers=headers)
+        if response.status_code not in (200, 304):
+            print(f"Failed to revalidate {detail_url}: {response.status_code}")
+            return
+        if not html_store.save_response(self.DETAIL_HTML_PATH, response, url=detail_url):
+            print(f"{detail_url} unchanged upstream, keeping the snapshot.")
+            source_cache.touch("manga-detail-page", self.JSON_PATH)
+            return
+        manga_detail = self.fetch_manga_detail_from_file(self.DETAIL_HTML_PATH)
+        if not manga_detail:
+            return
+        manga_detail["chapters"] = self.fetch_chapter_links_and_names_from_file(self.CHAPTER_HTML_PATH)
+        homepage_data = self.fetch_homepage_data()
+        manga_detail["most_viewed"] = homepage_data.get("most_viewed", [])
+        manga_detail["recommended"] = homepage_data.get("recommended", [])
+        source_cache.save_json("manga-detail-page", self.JSON_PATH, manga_detail)
 
     def get_manga_data(self):
         """
@@ -248,20 +280,21 @@ class MangaDetailPage:
         It also updates the JSON with homepage data (if available).
         """
         # If JSON data is already cached, load it.
-        if os.path.exists(self.JSON_PATH):
-            print(f"Loading manga data from {self.JSON_PATH}...")
-            with open(self.JSON_PATH, "r", encoding="utf-8") as file:
-                manga_detail = json.load(file)
+        manga_detail = source_cache.load_json("manga-detail-page", self.JSON_PATH)
+        if manga_detail is not None:
+            print(f"Loaded manga data for {self.JSON_PATH}.")
+            age = file_age(self.JSON_PATH)
+            if age is not None and age > self.SOFT_TTL:
+                snapshot_refresher.submit(self.JSON_PATH, self.refresh_snapshot)
         else:
             # If HTML file exists, extract details.
-            if os.path.exists(self.DETAIL_HTML_PATH):
+            if html_store.exists(self.DETAIL_HTML_PATH):
                 print(f"Extracting manga data from {self.DETAIL_HTML_PATH}...")
                 manga_detail = self.fetch_manga_detail_from_file(self.DETAIL_HTML_PATH)
                 chapter_data = self.fetch_chapter_links_and_names_from_file(self.CHAPTER_HTML_PATH)
                 if manga_detail:
                     manga_detail["chapters"] = chapter_data
-                    with open(self.JSON_PATH, "w", encoding="utf-8") as file:
-                        json.dump(manga_detail, file, ensure_ascii=False, indent=4)
+                    source_cache.save_json("manga-detail-page", self.JSON_PATH, manga_detail)
                     print(f"Manga data saved to {self.JSON_PATH}.")
                 else:
                     manga_detail = {}
@@ -281,8 +314,7 @@ class MangaDetailPage:
             if homepage_data:
                 manga_detail["most_viewed"] = homepage_data.get("most_viewed", [])
                 manga_detail["recommended"] = homepage_data.get("recommended", [])
-                with open(self.JSON_PATH, "w", encoding="utf-8") as file:
-                    json.dump(manga_detail, file, ensure_ascii=False, indent=4)
+                source_cache.save_json("manga-detail-page", self.JSON_PATH, manga_detail)
                 print("Updated manga detail JSON with homepage data.")
             else:
                 manga_detail.setdefault("most_viewed", [])
@@ -7,6 +7,9 @@ from collections import Counter
 from urllib.parse import urljoin, urlencode
 from django.db.models import F
 from api.models import ReadHistory
+from api.cache import source_cache, snapshot_refresher, file_age, html_store
+from api.utils.config import get_setting
+from api.utils.http import http_client
 
 
 def clean_text(text):
@@ -23,7 +26,7 @@ def fetch_latest_chapters(manga_title):
 
     try:
         # 1. Search for manga title
-        response = requests.get(search_url, params={"word": manga_title}, headers=headers, timeout=10)
+        response = http_client.get(search_url, params={"word": manga_title}, headers=headers, timeout=10)
         response.raise_for_status()
     except Exception as e:
         print(f"❌ Search request failed: {e}")
@@ -44,7 +47,7 @@ def fetch_latest_chapters(manga_title):
     print(f"✅ Found manga detail URL: {detail_url}")
 
     try:
-        detail_resp = requests.get(detail_url, headers=headers, timeout=10)
+        detail_resp = http_client.get(detail_url, headers=headers, timeout=10)
         detail_resp.raise_for_status()
     except Exception as e:
         print(f"❌ Failed to fetch manga detail page: {e}")
@@ -81,6 +84,8 @@ class MangaHomePage:
     REMOTE_HTML_URL = "https://manganow.to/home"
     FILTER_URL       = "https://manganow.to/filter"
     PERSONAL_DIR     = "sources/manga-homepage/personal"
+    # Snapshots older than this are still served, but trigger a background refresh.
+    SOFT_TTL         = get_setting("MANGA_HOMEPAGE_SOFT_TTL", 6 * 60 * 60)
 
     GENRE_MAPPING = {
         "action": "1", "adventure": "2", "animated": "641", "anime": "375",
@@ -558,7 +563,7 @@ class MangaHomePage:
 
         # 3) Fetch & scrape
         try:
-            resp = requests.get(url, timeout=5)
+            resp = http_client.get(url, timeout=5)
             resp.raise_for_status()
         except requests.RequestException:
             return []  # or return stale cache if you prefer
@@ -601,48 +606,70 @@ class MangaHomePage:
 
         return recs
 
+    def _fetch_homepage_html(self, revalidate=False):
+        """
+        Fetches and saves the homepage HTML and returns it.
+        With revalidate=True this is a conditional GET that returns None if the page is unchanged.
+        """
+        headers = html_store.conditional_headers(self.HTML_FILE) if revalidate else {}
+        response = http_client.get(self.REMOTE_HTML_URL, headers=headers)
+        if response.status_code not in (200, 304):
+            raise Exception(
+                f"Failed to fetch HTML. Status code: {response.status_code}"
+            )
+        changed = html_store.save_response(self.HTML_FILE, response, url=self.REMOTE_HTML_URL)
+        if revalidate and not changed:
+            return None
+        print("Fetched HTML from remote URL and saved locally.")
+        return response.text
+
+    def _parse_homepage_html(self, html):
+        soup = BeautifulSoup(html, "html.parser")
+        return {
+            "image_slider": self.extract_image_slider(soup),
+            "trending": self.extract_trending(soup),
+            "recommended": self.extract_recommended(soup),
+            "latest_update": self.extract_latest_update(soup),
+            "most_viewed": self.extract_most_viewed(soup),
+            "completed": self.extract_completed(soup),
+            "genres": self.extract_genres(soup),  # Added extraction for genres
+        }
+
+    def refresh_snapshot(self):
+        """
+        Revalidates the homepage with a conditional GET. Only a changed page is
+        re-parsed and replaces the JSON snapshot; otherwise the snapshot is marked fresh.
+        """
+        html = self._fetch_homepage_html(revalidate=True)
+        if html is None:
+            print("Manga homepage unchanged upstream, keeping the snapshot.")
+            source_cache.touch("manga-homepage", self.JSON_FILE)
+            return
+        data = self._parse_homepage_html(html)
+        source_cache.save_json("manga-homepage", self.JSON_FILE, data)
+
     def get_homepage_data(self, request=None):
-        data = None
-        # Step 1: Try to load data from JSON file if it exists
-        if os.path.exists(self.JSON_FILE):
-            with open(self.JSON_FILE, "r", encoding="utf8") as infile:
-                data = json.load(infile)
-            print("Loaded data from JSON file.")
+        # Step 1: Try to load data from the JSON cache (memory, then disk).
+        # A snapshot past SOFT_TTL is served as-is while one background refresh replaces it.
+        data = source_cache.load_json("manga-homepage", self.JSON_FILE)
+        if data is not None:
+            print("Loaded data from JSON cache.")
+            age = file_age(self.JSON_FILE)
+            if age is not None and age > self.SOFT_TTL:
+                snapshot_refresher.submit(self.JSON_FILE, self.refresh_snapshot)
 
         # Step 2: If no JSON data, try to load HTML from a local file
         if data is None:
-            if os.path.exists(self.HTML_FILE):
-                with open(self.HTML_FILE, "r", encoding="utf8") as f:
-                    html = f.read()
+            if html_store.exists(self.HTML_FILE):
+                html = html_store.read(self.HTML_FILE)
                 print("Loaded HTML from local file.")
             else:
                 # Step 3: Fetch HTML from the remote URL if not available locally
                 print("HTML file not found locally. Fetching from remote URL...")
-                response = requests.get(self.REMOTE_HTML_URL)
-                if response.status_code == 200:
-                    html = response.text
-                    os.makedirs(os.path.dirname(self.HTML_FILE), exist_ok=True)
-                    with open(self.HTML_FILE, "w", encoding="utf8") as f:
-                        f.write(html)
-                    print("Fetched HTML from remote URL and saved locally.")
-                else:
-                    raise Exception(
-                        f"Failed to fetch HTML. Status code: {response.status_code}"
-                    )
-
-            soup = BeautifulSoup(html, "html.parser")
-            data = {
-                "image_slider": self.extract_image_slider(soup),
-                "trending": self.extract_trending(soup),
-                "recommended": self.extract_recommended(soup),
-                "latest_update": self.extract_latest_update(soup),
-                "most_viewed": self.extract_most_viewed(soup),
-                "completed": self.extract_completed(soup),
-                "genres": self.extract_genres(soup),  # Added extraction for genres
-            }
-            os.makedirs(os.path.dirname(self.JSON_FILE), exist_ok=True)
-            with open(self.JSON_FILE, "w", encoding="utf8") as outfile:
-                json.dump(data, outfile, indent=4, ensure_ascii=False)
+                html = self._fetch_homepage_html()
+
+            data = self._parse_homepage_html(html)
+            source_cache.save_json("manga-homepage", self.JSON_FILE, data)
             print(f"Extracted data saved to {self.JSON_FILE}")
 
         print("Data processing complete.")
@@ -663,13 +690,10 @@ class MangaHomePage:
         if user and getattr(user, "is_authenticated", False):
             os.makedirs(self.PERSONAL_DIR, exist_ok=True)
             personal_path = os.path.join(self.PERSONAL_DIR, f"{user.username}.json")
-            if os.path.exists(personal_path):
-                with open(personal_path, "r", encoding="utf8") as pf:
-                    recs = json.load(pf)
-            else:
+            recs = source_cache.load_json("manga-homepage-personal", personal_path)
+            if recs is None:
                 recs = self._get_personal_recommendations(user)
-                with open(personal_path, "w", encoding="utf8") as pf:
-                    json.dump(recs, pf, indent=4, ensure_ascii=False)
+                source_cache.save_json("manga-homepage-personal", personal_path, recs)
 
             if recs:
                 data["personal_recommendations"] = recs
@@ -1,9 +1,13 @@
-import os, re, json, time, requests
+import os, re, json, time
 from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import undetected_chromedriver as uc
+
+from api.cache import source_cache, read_path_index, negative_cache, scrape_flight
+from api.browser import get_pool, BrowserPoolBusy, BrowserPoolTimeout, wait_for_stable_count
+from api.utils.http import http_client
+from api.utils.upstream import upstream_guard
 
 class ReadPage:
     BASE_TITLE_URL = "https://mangapark.io/title/"
@@ -11,73 +15,60 @@ class ReadPage:
     CACHE_DIR = os.path.join("sources", "read-page")
 
     def __init__(self, headless: bool = True):
+        # One ReadPage is shared by all requests, so it holds no driver of its own:
+        # every scrape leases one from the "read" pool (size, lease_timeout and
+        # max_waiters are configurable through BROWSER_POOLS).
         self.headless = headless
-        self.driver = None
-        self.wait = None
+        self.pool_name = "read" if headless else "read-visible"
         os.makedirs(self.CACHE_DIR, exist_ok=True)
 
-    def initialize_driver(self):
-        if self.driver: return  # Already initialized
-        print("[INFO] Initializing ChromeDriver...")
-        chrome_options = uc.ChromeOptions()
-
-        if self.headless:
-            chrome_options.add_argument("--headless=new")
-
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920x1080")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-
-        self.driver = uc.Chrome(options=chrome_options)
-        self.wait = WebDriverWait(self.driver, 30)
-
-        # ⚠️ Chrome 117+ headless fix
-        custom_user_agent = (
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/117.0.0.0 Safari/537.36"
-        )
-        self.driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": custom_user_agent})
-        print(f"[INFO] User-Agent overridden to: {custom_user_agent}")
-        print("[INFO] ChromeDriver initialized successfully!")
-
     def _get_cache_filename(self, key: str) -> str:
         safe_name = re.sub(r'[<>:"/\\|?*]', '_', key)
         return os.path.join(self.CACHE_DIR, f"{safe_name}.json")
 
     def _load_from_cache(self, filepath: str):
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if isinstance(data, dict) and "images" in data:
-                        return data
-                    os.remove(filepath)
-            except json.JSONDecodeError:
-                os.remove(filepath)
+        data = source_cache.load_json("read-page", filepath)
+        if data is None:
+            return None
+        if isinstance(data, dict) and "images" in data:
+            return data
+        source_cache.delete("read-page", filepath)
+        if isinstance(data, dict) and data.get("manga_title") and data.get("chapter"):
+            read_path_index.remove(data["manga_title"], data["chapter"])
         return None
 
     def _save_to_cache(self, filepath: str, data):
         try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            source_cache.save_json("read-page", filepath, data, indent=2, ensure_ascii=True)
+            if data.get("manga_title") and data.get("chapter"):
+                read_path_index.add(data["manga_title"], data["chapter"], data.get("resolved_path", ""), filepath)
             print(f"✅ Saved cache to {filepath}")
         except Exception as e:
             print(f"❌ Failed to write cache: {e}")
 
     def _scrape_images(self, target_url: str):
-        print(f"🌐 Scraping images from: {target_url}")
-        self.initialize_driver()
+        # Concurrent requests for the same chapter share one browser run.
+        return scrape_flight.do(("read-images", target_url), self._scrape_images_once, target_url)
+
+    IMAGE_SELECTOR = 'div[data-name="image-show"] img'
 
+    def _scrape_images_once(self, target_url: str):
+        print(f"🌐 Scraping images from: {target_url}")
         try:
-            self.driver.get(target_url)
-            self.wait.until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'div[data-name="image-show"] img'))
-            )
-            time.sleep(2)
-            images = self.driver.find_elements(By.CSS_SELECTOR, 'div[data-name="image-show"] img')
-            image_urls = [img.get_attribute('src') for img in images if img.get_attribute('src')]
+            with get_pool(self.pool_name).lease() as driver:
+                with upstream_guard.guarded(target_url):
+                    driver.get(target_url)
+                WebDriverWait(driver, 30).until(
+                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, self.IMAGE_SELECTOR))
+                )
+                # The reader appends pages in batches; wait until no more are added.
+                wait_for_stable_count(driver, self.IMAGE_SELECTOR)
+                images = driver.find_elements(By.CSS_SELECTOR, self.IMAGE_SELECTOR)
+                image_urls = [img.get_attribute('src') for img in images if img.get_attribute('src')]
             return {"images": image_urls} if image_urls else {"images": [], "error": "No images found"}
+        except (BrowserPoolBusy, BrowserPoolTimeout) as e:
+            print(f"⏳ Reader busy: {e}")
+            return {"images": [], "error": "Reader is busy, please try again shortly."}
         except Exception as e:
             error_message = f"Failed to fetch images: {str(e)}"
             print("❌ " + error_message)
@@ -85,9 +76,13 @@ class ReadPage:
 
     def _search_latest_chapter_url(self, title: str) -> str:
         print(f"🔍 Searching for manga: {title}")
+        if negative_cache.is_missing("mangapark-search", title) or negative_cache.is_missing(
+            "mangapark-latest-chapter", title
+        ):
+            return ""
         params = {"word": title, "page": 1}
         try:
-            response = requests.get(self.SEARCH_URL, params=params, timeout=15)
+            response = http_client.get(self.SEARCH_URL, params=params, timeout=15)
             if response.status_code != 200:
                 print(f"❌ Search failed: {response.status_code}")
                 return ""
@@ -95,6 +90,7 @@ class ReadPage:
             card = soup.find("div", {"q:key": "q4_9"})
             if not card:
                 print("❌ No manga card found.")
+                negative_cache.mark_missing("mangapark-search", title, "no search result")
                 return ""
             latest_div = card.find("div", {"q:key": "R7_8"})
             if latest_div:
@@ -102,6 +98,7 @@ class ReadPage:
                 href = latest_link.get("href", "")
                 return f"https://mangapark.io{href}" if href.startswith("/") else href
             print("❌ Latest chapter not found in result.")
+            negative_cache.mark_missing("mangapark-latest-chapter", title, "no latest chapter")
             return ""
         except Exception as e:
             print(f"❌ Search error: {str(e)}")
@@ -161,14 +158,6 @@ class ReadPage:
 
         return data_to_return
 
-    def __del__(self):
-        if self.driver:
-            try:
-                self.driver.quit()
-                print("[INFO] ChromeDriver closed.")
-            except Exception:
-                pass
-
 
 # Example usage
 if __name__ == "__main__":
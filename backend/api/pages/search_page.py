@@ -2,10 +2,15 @@ import os
 import time
 import json
 import urllib.parse
-import requests
-import undetected_chromedriver as uc
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from api.cache import html_store, disk_budget
+from api.browser import get_pool, wait_for_network_idle
+from api.utils.async_http import async_fetcher
+from api.utils.upstream import upstream_guard
 
 class SearchPage:
     """
@@ -13,7 +18,7 @@ class SearchPage:
       - Generate a dynamic search URL using the anime title and optional filters.
       - Fetch HTML content (using undetected‑chromedriver) for page‑1.
       - Parse filter data and card data from the HTML.
-      - Fetch all card data concurrently from page‑1 to the last page.
+      - Fetch all card data concurrently from page‑1 to the last page (async fetcher).
       - Return combined search results (filters and cards).
     """
 
@@ -70,34 +75,51 @@ class SearchPage:
         Return HTML content by reading an existing file or by fetching it using Selenium.
         This is used to fetch page1 HTML for filters and pagination.
         """
-        if os.path.exists(self.html_filename):
+        if html_store.exists(self.html_filename):
             print(f"Reading existing HTML file: {self.html_filename}")
-            with open(self.html_filename, "r", encoding="utf-8") as f:
-                return f.read()
+            return html_store.read(self.html_filename)
         else:
             print(f"{self.html_filename} not found. Fetching page from URL: {url}")
-            options = uc.ChromeOptions()
-            # Uncomment the next line if headless is desired:
-            # options.add_argument("--headless")
-            driver = uc.Chrome(options=options)
-            try:
-                driver.get(url)
-                time.sleep(1)  # Allow dynamic content to load
+            with get_pool("search").lease() as driver:
+                with upstream_guard.guarded(url):
+                    driver.get(url)
+                # Wait for the filter form, then for the page's own requests to settle.
+                WebDriverWait(driver, 20).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "form.sorters"))
+                )
+                wait_for_network_idle(driver, timeout=5)
                 html_content = driver.page_source
-                with open(self.html_filename, "w", encoding="utf-8") as f:
-                    f.write(html_content)
-                print(f"HTML saved as {self.html_filename}")
-                return html_content
-            finally:
-                driver.quit()
-                uc.Chrome.__del__ = lambda self: None
+            html_store.save(self.html_filename, html_content)
+            print(f"HTML saved as {self.html_filename}")
+            return html_content
+
+    @staticmethod
+    def parse_document(html: str) -> BeautifulSoup:
+        """Build the parsed document for one search page; every extractor below reads from it."""
+        return BeautifulSoup(html, 'html.parser')
+
+    def parse_page(self, html: str, page: int = 1) -> dict:
+        """
+        Parse one search page once and extract everything needed from it.
+        Page 1 yields filters, the last page number and cards; later pages only cards.
+        """
+        soup = self.parse_document(html)
+        if page != 1:
+            return {"cards": self.cards_from_document(soup)}
+        return {
+            "filters": self.filters_from_document(soup),
+            "last_page": self.last_page_from_document(soup),
+            "cards": self.cards_from_document(soup),
+        }
 
     def get_last_page_no(self, html: str) -> int:
         """
         Parse the provided HTML to extract the last page number from the pagination.
         Returns 1 if not found.
         """
-        soup = BeautifulSoup(html, 'html.parser')
+        return self.last_page_from_document(self.parse_document(html))
+
+    def last_page_from_document(self, soup: BeautifulSoup) -> int:
         pagination_ul = soup.find("ul", class_="pagination")
         if pagination_ul:
             last_link = pagination_ul.find("a", title="Last")
@@ -128,7 +150,9 @@ class SearchPage:
         Parse and extract filter data from the provided HTML content.
         Returns a list of dictionaries with filter titles and options.
         """
-        soup = BeautifulSoup(html, 'html.parser')
+        return self.filters_from_document(self.parse_document(html))
+
+    def filters_from_document(self, soup: BeautifulSoup) -> list:
         form = soup.find("form", class_=lambda x: x and "sorters" in x.split())
         if not form:
             print("Filter form not found. The page structure may be different.")
@@ -170,7 +194,9 @@ class SearchPage:
         Extract card details from the provided HTML content.
         Returns a list of dictionaries with details such as title, URL, poster image, etc.
         """
-        soup = BeautifulSoup(html, 'html.parser')
+        return self.cards_from_document(self.parse_document(html))
+
+    def cards_from_document(self, soup: BeautifulSoup) -> list:
         cards = []
         container = soup.find("div", class_=lambda x: x and "main-card" in x.split())
         if not container:
@@ -219,46 +245,30 @@ class SearchPage:
         print(f"Fetched {len(cards)} cards from HTML.")
         return cards
 
-    def fetch_cards_for_page(self, page: int, session: requests.Session) -> tuple:
+    def cards_from_response(self, page: int, response, error=None) -> list:
         """
-        Fetch the HTML for a specific search page and extract card data.
-        Returns a tuple: (page number, list of card dictionaries).
+        Extract card data from a fetched search page.
+        Returns an empty list if the fetch failed or the page did not answer 200.
         """
-        url = self.generate_dynamic_url(page)
-        print(f"Fetching cards from page {page}: {url}")
-        try:
-            response = session.get(url, timeout=10)
-            if response.status_code != 200:
-                print(f"Page {page} returned status code {response.status_code}.")
-                return page, []
-            html = response.text
-            cards = self.fetch_cards_from_html(html)
-            return page, cards
-        except Exception as e:
-            print(f"Error on page {page}: {e}")
-            return page, []
+        if error is not None:
+            print(f"Error on page {page}: {error}")
+            return []
+        if response.status_code != 200:
+            print(f"Page {page} returned status code {response.status_code}.")
+            return []
+        return self.parse_page(response.text, page)["cards"]
 
-    def fetch_all_cards(self, max_workers: int = 10) -> list:
+    def fetch_all_cards(self, first: dict = None) -> list:
         """
-        Fetch card details from multiple pages concurrently.
-        Uses the page‑1 HTML to determine the last page number.
-        Returns a combined list of card dictionaries.
+        Fetch card details from all pages concurrently through the shared async fetcher.
+        Page 1 comes from `first` (see load_first_page); pages 2..last are fetched and
+        parsed as they arrive. Returns a combined list of card dictionaries in page order.
         """
-        url_page1 = self.generate_dynamic_url(page=1)
-        page1_html = self.get_html_content(url_page1)
-        last_page = self.get_last_page_no(page1_html)
+        first = first or self.load_first_page()
+        last_page = first["last_page"]
+        pages_results = {1: first["cards"]}
+        pages_results.update(self.fetch_pages(range(2, last_page + 1)))
         all_cards = []
-        session = requests.Session()
-        futures = {}
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for page in range(1, last_page + 1):
-                future = executor.submit(self.fetch_cards_for_page, page, session)
-                futures[future] = page
-            pages_results = {}
-            for future in as_completed(futures):
-                page, cards = future.result()
-                pages_results[page] = cards
-        session.close()
         for page in range(1, last_page + 1):
             cards = pages_results.get(page, [])
             if not cards:
@@ -267,6 +277,89 @@ class SearchPage:
         print(f"Total cards fetched from all pages: {len(all_cards)}")
         return all_cards
 
+    def load_first_page(self) -> dict:
+        """
+        Load page 1 (snapshot or browser) and return its filters, last page number and cards.
+        Page 1 is never fetched again after this.
+        """
+        page1_html = self.get_html_content(self.generate_dynamic_url(page=1))
+        return self.parse_page(page1_html, page=1)
+
+    def fetch_pages(self, pages: list):
+        """
+        Fetch the given upstream pages (page 2 onwards) concurrently.
+        Yields (page, cards) in completion order.
+        """
+        urls = {page: self.generate_dynamic_url(page) for page in pages}
+        for page, response, error in async_fetcher.fetch_many(urls, timeout=10):
+            yield page, self.cards_from_response(page, response, error)
+
+    def get_results_page(self, page: int, page_size: int = None, first: dict = None) -> dict:
+        """
+        Return one page of results, scraping only the upstream pages that cover it.
+        Without page_size a page is one upstream page; otherwise cards are re-paged
+        to page_size, using the page‑1 card count as the upstream page size.
+        """
+        first = first or self.load_first_page()
+        last_page = first["last_page"]
+        upstream_size = len(first["cards"]) or 1
+        page_size = page_size or upstream_size
+        start = (page - 1) * page_size
+        first_upstream = start // upstream_size + 1
+        last_upstream = min((start + page_size - 1) // upstream_size + 1, last_page)
+
+        pages_results = {1: first["cards"]}
+        wanted = [p for p in range(first_upstream, last_upstream + 1) if p != 1]
+        pages_results.update(self.fetch_pages(wanted))
+        cards = []
+        for upstream_page in range(first_upstream, last_upstream + 1):
+            cards.extend(pages_results.get(upstream_page, []))
+        offset = start - (first_upstream - 1) * upstream_size
+        cards = cards[offset:offset + page_size]
+
+        # The last upstream page may be short, so the total is an estimate until it is scraped.
+        total_pages = max(1, -(-(last_page * upstream_size) // page_size))
+        return {
+            "filters": first["filters"],
+            "cards": cards,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": total_pages,
+            "has_next": page < total_pages,
+            "last_page": last_page,
+        }
+
+    def stream_results(self, first: dict = None):
+        """
+        Yield search results as they become available: the filters and page‑1 cards
+        first, then every later page in page order as soon as it (and all pages
+        before it) have been scraped. The combined JSON is saved once all pages are in.
+        """
+        first = first or self.load_first_page()
+        last_page = first["last_page"]
+        yield {"type": "filters", "filters": first["filters"], "last_page": last_page}
+        yield {"type": "page", "page": 1, "cards": first["cards"]}
+
+        all_cards = list(first["cards"])
+        pending = {}
+        next_page = 2
+        for page, cards in self.fetch_pages(range(2, last_page + 1)):
+            pending[page] = cards
+            while next_page in pending:
+                cards = pending.pop(next_page)
+                all_cards.extend(cards)
+                yield {"type": "page", "page": next_page, "cards": cards}
+                next_page += 1
+
+        self.save_search_results({"filters": first["filters"], "cards": all_cards, "last_page": last_page})
+        yield {"type": "done", "total_cards": len(all_cards)}
+
+    def save_search_results(self, search_data: dict):
+        with open(self.combined_json_filename, "w", encoding="utf-8") as f:
+            json.dump(search_data, f, indent=3)
+        disk_budget.touch(self.combined_json_filename, written=True)
+        print(f"Search page data saved as {self.combined_json_filename}")
+
     def get_search_results(self) -> dict:
         """
         Retrieve the complete search results, including filter data and all card data.
@@ -276,21 +369,16 @@ class SearchPage:
             print(f"Reading search page data from existing JSON file: {self.combined_json_filename}")
             with open(self.combined_json_filename, "r", encoding="utf-8") as f:
                 search_data = json.load(f)
+            disk_budget.touch(self.combined_json_filename)
             return search_data
         else:
-            url_page1 = self.generate_dynamic_url(page=1)
-            page1_html = self.get_html_content(url_page1)
-            filters = self.fetch_filters(page1_html)
-            last_page = self.get_last_page_no(page1_html)
-            cards = self.fetch_all_cards()
+            first = self.load_first_page()
             search_data = {
-                "filters": filters,
-                "cards": cards,
-                "last_page": last_page
+                "filters": first["filters"],
+                "cards": self.fetch_all_cards(first),
+                "last_page": first["last_page"]
             }
-            with open(self.combined_json_filename, "w", encoding="utf-8") as f:
-                json.dump(search_data, f, indent=3)
-            print(f"Search page data saved as {self.combined_json_filename}")
+            self.save_search_results(search_data)
             return search_data
 
 # For local testing
@@ -3,10 +3,11 @@ import re
 import json
 import time
 import concurrent.futures
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urljoin, urlparse
 import requests
 from bs4 import BeautifulSoup
-import undetected_chromedriver as uc
+import lxml.html
+import lxml.etree
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -18,6 +19,11 @@ import datetime
 
 # Import AnimeDetailPage from the local module to avoid circular imports.
 from .anime_detail_page import AnimeDetailPage
+from api.cache import scrape_flight, SQLiteKVStore, html_store
+from api.browser import get_pool
+from api.utils.config import get_setting
+from api.utils.http import http_client
+from api.utils.upstream import UpstreamUnavailable, upstream_guard
 
 router = Router()
 
@@ -43,8 +49,12 @@ class AnimeFetcher:
 
     @classmethod
     def get_first_card_url(cls, custom_url):
-        """Fetch the first card URL for the anime."""
-        response = requests.get(custom_url)
+        """Fetch the first card URL for the anime, sharing one request between concurrent callers."""
+        return scrape_flight.do(("first-card", custom_url), cls._fetch_first_card_url, custom_url)
+
+    @classmethod
+    def _fetch_first_card_url(cls, custom_url):
+        response = http_client.get(custom_url)
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, "html.parser")
             first_card = soup.find("div", class_="original anime main-card")
@@ -63,31 +73,28 @@ class AnimeFetcher:
 
 class VideoPageScraper:
     """Scrapes and caches video page details."""
+    @classmethod
+    def fetch_video_page(cls, url, html_path):
+        """Fetch the HTML page using Selenium and save it. Concurrent callers share one browser run."""
+        scrape_flight.do(("video-page", html_path), cls._fetch_video_page, url, html_path)
+
     @staticmethod
-    def fetch_video_page(url, html_path):
-        """Fetch the HTML page using Selenium and save it."""
-        options = uc.ChromeOptions()
-        options.add_argument("--disable-gpu")
-        options.add_argument("--headless")
-        options.add_argument("--blink-settings=imagesEnabled=false")
-        options.add_argument("--window-size=1920x1080")
-        driver = uc.Chrome(options=options)
-        try:
-            driver.get(url)
-            # Wait until the server-wrapper is present
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "server-wrapper"))
-            )
-            page_html = driver.page_source
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(page_html)
-            print(f"Page HTML saved to {html_path}")
-        except Exception as e:
-            print("Error fetching video page:", e)
-        finally:
-            driver.quit()
-        # Prevent driver quit issues
-        uc.Chrome.__del__ = lambda self: None
+    def _fetch_video_page(url, html_path):
+        with get_pool("scrape").lease() as driver:
+            try:
+                with upstream_guard.guarded(url):
+                    driver.get(url)
+                # Wait until the server-wrapper is present
+                WebDriverWait(driver, 20).until(
+                    EC.presence_of_element_located((By.CLASS_NAME, "server-wrapper"))
+                )
+                page_html = driver.page_source
+                html_store.save(html_path, page_html)
+                print(f"Page HTML saved to {html_path}")
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                print("Error fetching video page:", e)
 
     @staticmethod
     def scrape_video_page(html):
@@ -155,16 +162,19 @@ class VideoPageScraper:
             else:
                 print("No timestamp found, refreshing cache...")
 
-        if not os.path.exists(html_path):
+        if not html_store.exists(html_path):
             cls.fetch_video_page(first_card_url, html_path)
             print(f"Fetched HTML and saved to {html_path}")
         else:
             print(f"Using existing HTML file: {html_path}")
 
-        with open(html_path, "r", encoding="utf-8") as f:
-            html = f.read()
+        html = html_store.read(html_path)
         data = cls.scrape_video_page(html)
+        cls.write_details_cache(json_cache_path, data)
+        return data
 
+    @staticmethod
+    def write_details_cache(json_cache_path, data):
         os.makedirs(os.path.dirname(json_cache_path), exist_ok=True)
         with open(json_cache_path, "w", encoding="utf-8") as f:
             json.dump({
@@ -172,10 +182,15 @@ class VideoPageScraper:
                 "data": data
             }, f, indent=4, ensure_ascii=False)
         print(f"Scraped data saved to {json_cache_path}")
-        return data
 
 class IframeExtractor:
-    """Fetches iframe src URL for the specified server."""
+    """
+    Fetches iframe src URL for the specified server.
+    Strategies are tried in order of what last worked for the episode's host:
+      - "http": fetch the episode page and the server's embed fragment with plain
+        requests and read the iframe src with lxml (milliseconds).
+      - "browser": load the page in Chrome and click the server (seconds).
+    """
 
     @staticmethod
     def extract_anime_and_episode(url):
@@ -188,113 +203,284 @@ class IframeExtractor:
         episode_name = episode_slug.replace("ep-", "Episode ")
         return anime_name, episode_name
 
-    @staticmethod
-    def load_cache(file_name="sources/video-page/videos_cache.json", cache_type="video"):
-        """Load iframe cache and remove expired entries based on cache type."""
-        if not os.path.exists(file_name):
-            return {}
+    # Iframe srcs expire quickly upstream, so entries live for 120 seconds.
+    VIDEO_CACHE_TTL = 120
+    video_cache = SQLiteKVStore("video_iframes", default_ttl=VIDEO_CACHE_TTL)
 
-        with open(file_name, "r") as f:
-            cache = json.load(f)
+    @classmethod
+    def fetch_iframe_src(cls, url, category, server_name, strategies=None):
+        """
+        Open the anime episode page and extract the iframe's src for the specified server under a given category.
+        `strategies` restricts the chain (e.g. ("http",) while the caller holds a browser).
+        """
+        cache_key = cls.cache_key_for(url, category, server_name)
+
+        iframe_src = cls.video_cache.get(cache_key)
+        if iframe_src:
+            print(f"Cache hit! Found iframe src: {iframe_src}")
+            return iframe_src
+
+        print("Cache miss. Fetching iframe src...")
+        # Only one browser run per key; concurrent requests wait for its result.
+        strategies = tuple(strategies or cls.STRATEGIES)
+        return scrape_flight.do(
+            ("iframe", cache_key, strategies),
+            cls._scrape_iframe_src, url, category, server_name, cache_key, strategies,
+        )
+
+    @classmethod
+    def cache_key_for(cls, url, category, server_name):
+        anime_name, episode_name = cls.extract_anime_and_episode(url)
+        return f"{anime_name}|{episode_name}|{category}|{server_name}"
+
+    STRATEGIES = ("http", "browser")
+    # The winning strategy per host ({"strategy": ..., "since": ...}) is trusted for
+    # PROBE_INTERVAL seconds; after that the chain starts from HTTP again once.
+    PROBE_INTERVAL = 24 * 60 * 60
+    strategy_store = SQLiteKVStore("iframe_strategies", sweep_interval=0)
+    # Endpoints the player script calls with a server's data-link-id to get its embed.
+    # Overridable with the WATCH_EMBED_ENDPOINTS setting when the site changes them.
+    EMBED_ENDPOINTS = get_setting("WATCH_EMBED_ENDPOINTS", [
+        "ajax/server?get={link_id}",
+        "ajax/episode/sources?id={link_id}",
+    ])
+    HTTP_HEADERS = {
+        "User-Agent": (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
+        ),
+        "X-Requested-With": "XMLHttpRequest",
+    }
+
+    @classmethod
+    def _strategy_record(cls, host):
+        """Returns the host's remembered winner, or None once it is due for a re-probe."""
+        record = cls.strategy_store.get(host)
+        if record and time.time() - record.get("since", 0) < cls.PROBE_INTERVAL:
+            return record
+        return None
 
-        # Set expiration time based on cache type
-        now = time.time()
-        expiration_time = 120 if cache_type == "video" else 86400  # 120 seconds (2 mins) for video cache, 86400 seconds (1 day) for others
+    @classmethod
+    def preferred_strategy(cls, url):
+        record = cls._strategy_record(urlparse(url).netloc)
+        return record["strategy"] if record else cls.STRATEGIES[0]
 
-        keys_to_delete = []
-        for key, value in cache.items():
-            timestamp = value.get("timestamp")
-            if not timestamp or now - timestamp > expiration_time:
-                keys_to_delete.append(key)
+    @classmethod
+    def _strategy_order(cls, url):
+        preferred = cls.preferred_strategy(url)
+        return [preferred] + [name for name in cls.STRATEGIES if name != preferred]
 
-        for key in keys_to_delete:
-            del cache[key]
+    @classmethod
+    def _scrape_iframe_src(cls, url, category, server_name, cache_key, strategies=STRATEGIES):
+        """Run the strategy chain, remember which strategy won for the host and cache the src."""
+        host = urlparse(url).netloc
+        for strategy in cls._strategy_order(url):
+            if strategy not in strategies:
+                continue
+            iframe_src = getattr(cls, f"_iframe_via_{strategy}")(url, category, server_name, cache_key)
+            if iframe_src:
+                print(f"Iframe src found via {strategy} strategy.")
+                # Written only when the winner changes or was re-probed, so `since`
+                # is not pushed forward by every successful scrape.
+                record = cls._strategy_record(host)
+                if record is None or record["strategy"] != strategy:
+                    cls.strategy_store.put(host, {"strategy": strategy, "since": time.time()}, ttl=None)
+                cls.video_cache.put(cache_key, iframe_src)
+                return iframe_src
+        return None
 
-        return cache
+    @classmethod
+    def _iframe_via_http(cls, url, category, server_name, cache_key):
+        """Read the iframe src without a browser. Returns None if the page needs JavaScript."""
+        try:
+            response = http_client.get(url, headers=cls.HTTP_HEADERS, timeout=10)
+            response.raise_for_status()
+            page = lxml.html.fromstring(response.text)
+
+            servers = page.xpath(
+                "//div[contains(@class, 'server-type')][@data-type=$category]"
+                "//div[contains(concat(' ', normalize-space(@class), ' '), ' server ')]",
+                category=category,
+            )
+            server = next(
+                (node for node in servers if node.xpath("string(.//span)").strip() == server_name), None
+            )
+            if server is None:
+                print(f"HTTP strategy: server '{server_name}' not in static HTML.")
+                return None
+
+            # Some pages render the active server's player server-side; it is only
+            # the one asked for when that server is the active one.
+            player_src = page.xpath("//div[@id='player']//iframe/@src")
+            if player_src and "active" in (server.get("class") or "").split():
+                return urljoin(url, player_src[0])
+
+            link_id = server.get("data-link-id")
+            if not link_id:
+                return None
+            for template in cls.EMBED_ENDPOINTS:
+                endpoint = urljoin(url, "/" + template.format(link_id=link_id))
+                embed = http_client.get(endpoint, headers={**cls.HTTP_HEADERS, "Referer": url}, timeout=10)
+                if embed.status_code != 200:
+                    continue
+                iframe_src = cls._embed_src_from_response(embed)
+                if iframe_src:
+                    return urljoin(url, iframe_src)
+            print("HTTP strategy: no embed endpoint returned an iframe src.")
+        except UpstreamUnavailable:
+            # The browser would go through the same host guard, so don't fall back.
+            raise
+        except (requests.RequestException, ValueError, lxml.etree.LxmlError) as e:
+            print(f"HTTP strategy failed: {e}")
+        return None
 
     @staticmethod
-    def save_cache(data, file_name="sources/video-page/videos_cache.json"):
-        """Save iframe cache to a file."""
-        with open(file_name, "w") as f:
-            json.dump(data, f, indent=4)
+    def _embed_src_from_response(response):
+        """Embed endpoints answer with JSON ({"result": {"url": ...}} and similar) or an HTML fragment."""
+        try:
+            data = response.json()
+        except ValueError:
+            data = response.text
+        if isinstance(data, dict):
+            result = data.get("result", data)
+            if isinstance(result, dict):
+                for key in ("url", "link", "src"):
+                    if isinstance(result.get(key), str) and result[key].startswith(("http", "//")):
+                        return result[key]
+                return None
+            data = result
+        if isinstance(data, str) and "<iframe" in data:
+            src = lxml.html.fromstring(data).xpath("//iframe/@src")
+            return src[0] if src else None
+        return None
 
     @classmethod
-    def fetch_iframe_src(cls, url, category, server_name, cache_file="sources/video-page/videos_cache.json"):
+    def _iframe_via_browser(cls, url, category, server_name, cache_key):
+        """Drive the browser to the episode page, click the server and cache the iframe src."""
+        with get_pool("scrape").lease() as driver:
+            try:
+                with upstream_guard.guarded(url):
+                    driver.get(url)
+                wait = WebDriverWait(driver, 20)
+                # Wait for server wrappers to load
+                wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, "server-wrapper")))
+                return cls.click_server_iframe(driver, wait, category, server_name, cache_key)
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                print(f"Error fetching iframe: {e}")
+                return None
+
+    @classmethod
+    def click_server_iframe(cls, driver, wait, category, server_name, cache_key):
         """
-        Open the anime episode page and extract the iframe's src for the specified server under a given category.
+        On an already loaded episode page, click the server and return (and cache) the iframe src.
         """
-        anime_name, episode_name = cls.extract_anime_and_episode(url)
-        cache = cls.load_cache(cache_file, cache_type="video")  # Use video cache type here
-        cache_key = f"{anime_name}|{episode_name}|{category}|{server_name}"
+        server_wrappers = driver.find_elements(By.CLASS_NAME, "server-wrapper")
+        print(f"Found {len(server_wrappers)} server-wrapper elements.")
+
+        target_server = None
+        # Loop through wrappers to find the target server in the desired category.
+        for wrapper in server_wrappers:
+            try:
+                category_elements = wrapper.find_elements(By.CSS_SELECTOR, f"div.server-type[data-type='{category}']")
+                print(f"Found {len(category_elements)} category elements matching '{category}'.")
+                for category_element in category_elements:
+                    server_list = category_element.find_elements(By.CSS_SELECTOR, "div.server")
+                    for server in server_list:
+                        try:
+                            server_name_element = server.find_element(By.TAG_NAME, "span")
+                            if server_name_element.text.strip() == server_name:
+                                target_server = server
+                                print(f"Found the server: {server_name}")
+                                break
+                        except Exception as e:
+                            print(f"Error finding server name element: {e}")
+                    if target_server:
+                        break
+                if target_server:
+                    break
+            except Exception as e:
+                print(f"Error processing a server-wrapper: {e}")
+                continue
+
+        if target_server is None:
+            raise Exception(f"Server '{server_name}' not found in category '{category}'.")
+
+        # Click the target server to load the iframe.
+        driver.execute_script("arguments[0].click();", target_server)
+        print(f"Clicked on server '{server_name}'. Waiting for iframe...")
+        iframe = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#player iframe")))
+        iframe_src = iframe.get_attribute("src")
+        print(f"Iframe src found: {iframe_src}")
+        cls.video_cache.put(cache_key, iframe_src)
+        return iframe_src
+
+
+class EpisodePageExtractor:
+    """
+    Loads an episode page once and takes both the server/episode details and the
+    iframe src from the same browser session.
+    """
 
-        if cache_key in cache:
-            iframe_src = cache[cache_key]["src"]
-            print(f"Cache hit! Found iframe src: {iframe_src}")
-            return iframe_src
+    @classmethod
+    def extract(cls, url, html_path, json_cache_path, category, server_name):
+        """
+        Returns (iframe_src, video_details). Falls back to the separate scrapers when
+        only one of them needs a browser: the other is cached, or the host serves
+        iframe srcs over plain HTTP.
+        """
+        cache_key = IframeExtractor.cache_key_for(url, category, server_name)
+        iframe_src = IframeExtractor.video_cache.get(cache_key)
+        needs_page = not html_store.exists(html_path)
+        iframe_needs_browser = IframeExtractor.preferred_strategy(url) == "browser"
+
+        if iframe_src or not needs_page or not iframe_needs_browser:
+            if iframe_src:
+                print(f"Cache hit! Found iframe src: {iframe_src}")
+            # While the page load holds a "scrape" browser, the iframe may only try HTTP:
+            # two leases per request let concurrent requests each hold one browser and
+            # wait for a second. The browser strategy runs after the page lease is back.
+            strategies = ("http",) if needs_page else None
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                future_iframe = None
+                if not iframe_src:
+                    future_iframe = executor.submit(
+                        IframeExtractor.fetch_iframe_src, url, category, server_name, strategies
+                    )
+                video_details = VideoPageScraper.scrape_and_cache(url, html_path, json_cache_path)
+                if future_iframe is not None:
+                    iframe_src = future_iframe.result()
+            if not iframe_src and strategies:
+                iframe_src = IframeExtractor.fetch_iframe_src(url, category, server_name, ("browser",))
+            return iframe_src, video_details
+
+        print("Cache miss for both iframe and episode page. Loading the page once...")
+        return scrape_flight.do(
+            ("episode-page", html_path, cache_key),
+            cls._scrape_episode_page, url, html_path, json_cache_path, category, server_name, cache_key,
+        )
 
-        print("Cache miss. Fetching iframe src...")
-        chrome_options = uc.ChromeOptions()
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
-        chrome_options.add_argument("--window-size=1920x1080")
-        driver = uc.Chrome(options=chrome_options)
-        iframe_src = None
-        try:
-            driver.get(url)
+    @staticmethod
+    def _scrape_episode_page(url, html_path, json_cache_path, category, server_name, cache_key):
+        with get_pool("scrape").lease() as driver:
+            with upstream_guard.guarded(url):
+                driver.get(url)
             wait = WebDriverWait(driver, 20)
-            # Wait for server wrappers to load
             wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, "server-wrapper")))
-            server_wrappers = driver.find_elements(By.CLASS_NAME, "server-wrapper")
-            print(f"Found {len(server_wrappers)} server-wrapper elements.")
-
-            target_server = None
-            # Loop through wrappers to find the target server in the desired category.
-            for wrapper in server_wrappers:
-                try:
-                    category_elements = wrapper.find_elements(By.CSS_SELECTOR, f"div.server-type[data-type='{category}']")
-                    print(f"Found {len(category_elements)} category elements matching '{category}'.")
-                    for category_element in category_elements:
-                        server_list = category_element.find_elements(By.CSS_SELECTOR, "div.server")
-                        for server in server_list:
-                            try:
-                                server_name_element = server.find_element(By.TAG_NAME, "span")
-                                if server_name_element.text.strip() == server_name:
-                                    target_server = server
-                                    print(f"Found the server: {server_name}")
-                                    break
-                            except Exception as e:
-                                print(f"Error finding server name element: {e}")
-                        if target_server:
-                            break
-                    if target_server:
-                        break
-                except Exception as e:
-                    print(f"Error processing a server-wrapper: {e}")
-                    continue
 
-            if target_server is None:
-                raise Exception(f"Server '{server_name}' not found in category '{category}'.")
-            
-            # Click the target server to load the iframe.
-            driver.execute_script("arguments[0].click();", target_server)
-            print(f"Clicked on server '{server_name}'. Waiting for iframe...")
-            iframe = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#player iframe")))
-            iframe_src = iframe.get_attribute("src")
-            print(f"Iframe src found: {iframe_src}")
-            cache[cache_key] = {
-                "src": iframe_src,
-                "timestamp": time.time()
-            }
-            cls.save_cache(cache, cache_file)
-            time.sleep(2)
-            return iframe_src
-        except Exception as e:
-            print(f"Error fetching iframe: {e}")
-            return None
-        finally:
-            driver.quit()
-            uc.Chrome.__del__ = lambda self: None
+            page_html = driver.page_source
+            html_store.save(html_path, page_html)
+            print(f"Page HTML saved to {html_path}")
+            video_details = VideoPageScraper.scrape_video_page(page_html)
+            VideoPageScraper.write_details_cache(json_cache_path, video_details)
+
+            try:
+                iframe_src = IframeExtractor.click_server_iframe(driver, wait, category, server_name, cache_key)
+            except Exception as e:
+                print(f"Error fetching iframe: {e}")
+                iframe_src = None
+        return iframe_src, video_details
 
 
 class WatchPage:
@@ -305,9 +491,8 @@ class WatchPage:
         Using the provided anime title, type, slug, and episode (e.g., "/dragon-ball-z-325/ep-12"):
           - Generate the custom URL and get the first card URL.
           - Run concurrently:
-              (a) Fetch the iframe src.
-              (b) Scrape and cache the video page details.
-              (c) Fetch anime detail page data.
+              (a) Fetch the iframe src and the video page details, loading the episode page only once.
+              (b) Fetch anime detail page data.
           - Return a combined object with iframe_src, video_details, anime_detail, and the current episode number.
         """
         try:
@@ -333,17 +518,13 @@ class WatchPage:
             pathname = "/" + slug   
 
             with concurrent.futures.ThreadPoolExecutor() as executor:
-                future_iframe = executor.submit(
-                    IframeExtractor.fetch_iframe_src, first_card_url, "sub", "Megaplay-1"
-                )
-                future_video_details = executor.submit(
-                    VideoPageScraper.scrape_and_cache, first_card_url, html_path, json_cache_path
+                future_episode = executor.submit(
+                    EpisodePageExtractor.extract, first_card_url, html_path, json_cache_path, "sub", "Megaplay-1"
                 )
                 anime_detail_instance = AnimeDetailPage()
                 future_anime_detail = executor.submit(anime_detail_instance.get_detail, pathname)
 
-                iframe_src = future_iframe.result()
-                video_details = future_video_details.result()
+                iframe_src, video_details = future_episode.result()
                 anime_detail = future_anime_detail.result() or {}  # Default to {} if None
 
             if not iframe_src:
@@ -355,6 +536,9 @@ class WatchPage:
                 "anime_detail": anime_detail,
                 "current_episode_number": current_episode_number,
             }
+        except UpstreamUnavailable:
+            # Mapped to 503 + Retry-After by the API's exception handler.
+            raise
         except Exception as e:
             print("Exception occurred:", traceback.format_exc())
             return {"message": f"Error: {str(e)}"}
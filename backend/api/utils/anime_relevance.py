@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import math
+import threading
+
+from api.utils.config import get_setting
+
+# Words that say "anime question" on their own, besides genres and titles.
+DOMAIN_TERMS = {
+    "anime", "manga", "manhwa", "manhua", "webtoon", "light novel", "otaku", "weeb", "waifu", "husbando",
+    "episode", "episodes", "season", "arc", "filler", "ova", "ona", "opening", "ending", "op", "ed",
+    "studio", "mappa", "ufotable", "ghibli", "toei", "crunchyroll", "funimation", "dub", "sub", "seiyuu",
+    "voice actor", "mangaka", "chapter", "chapters", "volume", "cosplay", "shonen", "shojo", "isekai",
+    "chibi", "senpai", "kawaii", "tsundere", "yandere", "kdrama", "donghua", "myanimelist", "mal",
+    "character", "characters", "protagonist", "villain", "power system", "nakama", "hokage", "bankai",
+}
+
+# Small labelled seed corpus; titles and genres from sources/ are added as anime examples.
+ANIME_EXAMPLES = [
+    "best isekai anime", "when does one piece end", "who is the strongest character in naruto",
+    "recommend me a romance anime", "what order should i watch the monogatari series",
+    "is the manga better than the anime", "how many episodes does bleach have",
+    "which studio animated attack on titan", "anime like death note", "who voices goku",
+    "what chapter does the anime end at", "top 10 shonen fights", "is chainsaw man season 2 out",
+    "explain the ending of evangelion", "what are good slice of life shows", "best manhwa to read",
+    "who would win gojo or sukuna", "what is the power system in hunter x hunter",
+    "where to start the jojo manga", "sad anime that will make me cry",
+]
+OFF_TOPIC_EXAMPLES = [
+    "what is the weather today", "how do i cook pasta", "write a python function to sort a list",
+    "what is the capital of france", "how to lose weight fast", "explain quantum computing",
+    "what is the stock price of apple", "solve this math equation for x", "how do i fix my car engine",
+    "translate hello to spanish", "who won the football match yesterday", "best laptop under 1000 dollars",
+    "how to write a cover letter", "what is the meaning of life", "tell me a joke about programmers",
+    "how to invest in crypto", "recipe for chocolate cake", "how many calories in an egg",
+    "what time is it in new york", "who is the president of the united states", "how to learn javascript",
+    "write an essay about climate change", "what are the symptoms of flu", "how to change a tire",
+    "book a flight to london", "convert 10 miles to kilometers", "how does the stock market work",
+    "explain photosynthesis", "what is sql injection", "help me with my tax return",
+    "how to cook rice", "how to bake bread at home", "what laptop should i buy for programming",
+    "weather forecast for tomorrow", "how to fix a bug in my code", "what is the best phone to buy",
+    "how to make money online", "what is machine learning", "how to get a job interview",
+    "what should i eat for dinner", "how to clean a kitchen", "debug my java program",
+    "best restaurants near me", "how to install windows", "what is the price of gold",
+    "plan a workout routine", "how to treat a headache", "write a poem about the sea",
+]
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "to", "of", "in", "on", "for", "and", "or", "with",
+    "what", "who", "how", "when", "where", "why", "which", "do", "does", "did", "i", "me", "my", "you",
+    "your", "it", "its", "this", "that", "can", "could", "should", "would", "will", "about", "like", "tell",
+    "best", "good", "give", "some", "any", "there", "at", "by", "from", "as", "please", "vs",
+}
+
+
+def tokenize(text: str) -> list:
+    return [token for token in re.findall(r"[a-z0-9]+", (text or "").casefold()) if token not in STOPWORDS]
+
+
+class AnimeRelevanceClassifier:
+    """
+    Cheap local check for clearly off-topic chatbot questions, run before any
+    browser is leased.
+      - A lexicon (genres from the homepage GENRE_MAPPINGs, DOMAIN_TERMS and the
+        titles cached in the detail and home snapshots under sources/) marks a
+        question as anime related outright.
+      - Otherwise a multinomial naive Bayes model, trained on the seed examples
+        plus cached titles, scores it; only questions whose off-topic probability
+        reaches `threshold` are rejected.
+    The model is built from whatever is on disk in a background thread, started
+    at app startup (warm_up); until it is ready every question is let through.
+    """
+
+    TITLE_KEYS = ("title", "manga_title", "japanese_title")
+    # Entries under sources_dir that hold titles; read-page, search and video
+    # snapshots are many and add nothing the detail pages do not have.
+    TITLE_SOURCES = (
+        "detail-page", "manga-detail-page", "home-page", "manga-homepage", "most_popular_anime.json",
+    )
+    # Questions with fewer known words than this are never rejected (too little evidence).
+    MIN_KNOWN_TOKENS = 2
+
+    def __init__(self, sources_dir: str = "sources", threshold: float = 0.9):
+        self.sources_dir = sources_dir
+        self.threshold = threshold
+        self.saved_launches = 0
+        self.checked = 0
+        self._lock = threading.Lock()
+        self._model = None
+        self._warmup = None
+
+    def _cached_titles(self) -> set:
+        titles = set()
+
+        def collect(node):
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    if key in self.TITLE_KEYS and isinstance(value, str):
+                        titles.add(value)
+                    elif key == "genres" and isinstance(value, list):
+                        titles.update(item for item in value if isinstance(item, str))
+                    else:
+                        collect(value)
+            elif isinstance(node, list):
+                for item in node:
+                    collect(item)
+
+        paths = []
+        for name in self.TITLE_SOURCES:
+            root = os.path.join(self.sources_dir, name)
+            if os.path.isfile(root):
+                paths.append(root)
+            for dirpath, _, files in os.walk(root):
+                paths.extend(os.path.join(dirpath, file) for file in files)
+
+        for path in paths:
+            file = os.path.basename(path)
+            if not file.endswith(".json"):
+                continue
+            if file.endswith("_manga_detail.json"):
+                titles.add(file[: -len("_manga_detail.json")].replace("_", " "))
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    collect(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return titles
+
+    def _build(self) -> dict:
+        # Imported here: the page modules pull in Selenium and the caches.
+        from api.pages.home_page import HomePage
+        from api.pages.manga_home_page import MangaHomePage
+
+        titles = self._cached_titles()
+        genres = set(HomePage.GENRE_MAPPING) | set(MangaHomePage.GENRE_MAPPING)
+        phrases = {" ".join(tokenize(term)) for term in DOMAIN_TERMS | genres}
+        # Titles count as lexicon phrases only when specific enough (2+ words or a long word).
+        for title in titles:
+            tokens = tokenize(title)
+            if len(tokens) >= 2 or (tokens and len(tokens[0]) >= 6):
+                phrases.add(" ".join(tokens))
+        phrases.discard("")
+
+        counts = {"anime": {}, "other": {}}
+        totals = {"anime": 0, "other": 0}
+        docs = {"anime": 0, "other": 0}
+        labelled = [("anime", text) for text in ANIME_EXAMPLES + sorted(titles | genres)]
+        labelled += [("other", text) for text in OFF_TOPIC_EXAMPLES]
+        for label, text in labelled:
+            docs[label] += 1
+            for token in tokenize(text):
+                counts[label][token] = counts[label].get(token, 0) + 1
+                totals[label] += 1
+        vocabulary = set(counts["anime"]) | set(counts["other"])
+        print(f"[AnimeRelevance] Built model: {len(phrases)} lexicon phrases, {len(vocabulary)} tokens.")
+        return {
+            "phrases": phrases,
+            "counts": counts,
+            "totals": totals,
+            # Equal priors: the seed corpora are not sized like real traffic.
+            "log_prior": {label: math.log(0.5) for label in docs},
+            "vocabulary": vocabulary,
+            "max_phrase_length": max((phrase.count(" ") + 1 for phrase in phrases), default=1),
+            "vocabulary_size": len(vocabulary) or 1,
+        }
+
+    def model(self) -> dict:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._build()
+        return self._model
+
+    def warm_up(self):
+        """Builds the model in a daemon thread (once), so no request pays for the disk walk."""
+        with self._lock:
+            if self._model is not None or self._warmup is not None:
+                return
+            self._warmup = threading.Thread(target=self._warm, name="anime-relevance-warmup", daemon=True)
+            self._warmup.start()
+
+    def _warm(self):
+        try:
+            self.model()
+        except Exception as e:
+            print(f"[AnimeRelevance] Could not build the model: {e}")
+            with self._lock:
+                self._warmup = None
+
+    def rebuild(self):
+        with self._lock:
+            self._model = self._build()
+
+    def lexicon_match(self, message: str) -> bool:
+        model = self.model()
+        tokens = tokenize(message)
+        # Check every n-gram of the message against the phrase set.
+        for size in range(1, min(model["max_phrase_length"], len(tokens)) + 1):
+            for start in range(len(tokens) - size + 1):
+                if " ".join(tokens[start:start + size]) in model["phrases"]:
+                    return True
+        return False
+
+    def known_tokens(self, message: str) -> list:
+        vocabulary = self.model()["vocabulary"]
+        return [token for token in tokenize(message) if token in vocabulary]
+
+    def off_topic_probability(self, message: str) -> float:
+        model = self.model()
+        # Unseen words carry no evidence either way, so they are left out.
+        tokens = self.known_tokens(message)
+        scores = {}
+        for label in ("anime", "other"):
+            denominator = model["totals"][label] + model["vocabulary_size"]
+            score = model["log_prior"][label]
+            for token in tokens:
+                score += math.log((model["counts"][label].get(token, 0) + 1) / denominator)
+            scores[label] = score
+        # Softmax over the two log scores.
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        return exp["other"] / (exp["anime"] + exp["other"])
+
+    def is_relevant(self, message: str) -> bool:
+        """False only for questions confidently classified as not anime related."""
+        with self._lock:
+            self.checked += 1
+        if self._model is None:
+            # Still building (or never started): never stall or reject a request on it.
+            self.warm_up()
+            return True
+        if len(self.known_tokens(message)) < self.MIN_KNOWN_TOKENS or self.lexicon_match(message):
+            return True
+        probability = self.off_topic_probability(message)
+        if probability >= self.threshold:
+            with self._lock:
+                self.saved_launches += 1
+            print(f"[AnimeRelevance] Off-topic ({probability:.2f}), skipping the browser: {message!r}")
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {"checked": self.checked, "saved_launches": self.saved_launches, "threshold": self.threshold}
+
+
+anime_relevance = AnimeRelevanceClassifier(threshold=get_setting("CHATBOT_RELEVANCE_THRESHOLD", 0.9))
@@ -0,0 +1,182 @@
+import random
+import asyncio
+import atexit
+import threading
+from concurrent.futures import as_completed
+from urllib.parse import urlparse
+
+import httpx
+
+from api.utils.config import get_setting
+from api.utils.http import DEFAULT_USER_AGENT
+from api.utils.upstream import upstream_guard
+
+
+class AsyncFetcher:
+    """
+    Process-wide asyncio fetch engine for fan-out downloads (e.g. every page of a search).
+      - One httpx.AsyncClient, living on a background event-loop thread, holds the
+        keep-alive connection pool for the whole process.
+      - At most `max_in_flight` requests run at once overall, and at most `per_host`
+        against any single host.
+      - 429/5xx answers and transport errors are retried `retries` times with
+        jittered exponential backoff, like the synchronous http_client.
+      - Each attempt passes the per-host rate limiter and circuit breaker first;
+        a refused page fails fast with UpstreamUnavailable.
+    Callers stay synchronous: fetch_many() yields responses as they complete, so
+    parsing happens on the calling thread while the remaining pages download.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        per_host: int = 6,
+        connect_timeout: float = 5,
+        read_timeout: float = 20,
+        retries: int = 2,
+        backoff_factor: float = 0.5,
+        user_agent: str = DEFAULT_USER_AGENT,
+    ):
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.user_agent = user_agent
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._global_limit = None
+        self._host_limits = {}
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=loop.run_forever, name="async-fetcher", daemon=True)
+                    thread.start()
+                    asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+                    self._thread = thread
+                    self._loop = loop
+                    print(f"[AsyncFetcher] Started (in flight {self.max_in_flight}, per host {self.per_host}).")
+        return self._loop
+
+    async def _start(self):
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            headers={"User-Agent": self.user_agent},
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight
+            ),
+        )
+        self._global_limit = asyncio.Semaphore(self.max_in_flight)
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        # Only touched from the loop thread, so no lock is needed.
+        host = urlparse(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return limit
+
+    def _backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 30.0)
+        delay = self.backoff_factor * (2 ** attempt)
+        return delay + random.uniform(0, delay)
+
+    async def _fetch(self, url: str, **kwargs) -> httpx.Response:
+        async with self._host_limit(url), self._global_limit:
+            self._in_flight += 1
+            try:
+                for attempt in range(self.retries + 1):
+                    last_try = attempt == self.retries
+                    host, wait = upstream_guard.admit(url)
+                    if wait:
+                        await asyncio.sleep(wait)
+                    try:
+                        response = await self._client.get(url, **kwargs)
+                    except httpx.TransportError as e:
+                        upstream_guard.record(host, error=e)
+                        if last_try:
+                            raise
+                        await asyncio.sleep(self._backoff(attempt))
+                        continue
+                    upstream_guard.record(host, status_code=response.status_code)
+                    if response.status_code in self.RETRY_STATUSES and not last_try:
+                        await asyncio.sleep(self._backoff(attempt, response))
+                        continue
+                    return response
+            finally:
+                self._in_flight -= 1
+
+    def fetch_many(self, urls: dict, **kwargs):
+        """
+        Fetches every URL in `urls` ({key: url}) concurrently and yields
+        (key, response, error) in completion order; exactly one of response/error is None.
+        Extra kwargs go to httpx.AsyncClient.get. Closing the generator early cancels
+        whatever has not finished yet.
+        """
+        loop = self._ensure_loop()
+        futures = {
+            asyncio.run_coroutine_threadsafe(self._fetch(url, **kwargs), loop): key
+            for key, url in urls.items()
+        }
+        try:
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    self._failed += 1
+                    yield key, None, e
+                else:
+                    self._completed += 1
+                    yield key, response, None
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def fetch(self, url: str, **kwargs) -> httpx.Response:
+        """Fetches a single URL through the shared pool and limits."""
+        for _, response, error in self.fetch_many({url: url}, **kwargs):
+            if error is not None:
+                raise error
+            return response
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "per_host": self.per_host,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "failed": self._failed,
+            "hosts": len(self._host_limits),
+        }
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(timeout=5)
+            except Exception:
+                pass
+            loop.call_soon_threadsafe(loop.stop)
+            self._client = None
+            self._host_limits = {}
+
+
+async_fetcher = AsyncFetcher(**get_setting("ASYNC_FETCHER", {}))
+
+atexit.register(async_fetcher.close)
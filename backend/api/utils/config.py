@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def get_setting(name, default=None):
+    """
+    Returns a value from Django settings, or the default when the setting is
+    missing or Django is not configured (e.g. when a page module is run standalone).
+    """
+    try:
+        return getattr(settings, name, default)
+    except ImproperlyConfigured:
+        return default
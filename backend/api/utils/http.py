@@ -0,0 +1,120 @@
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.utils.config import get_setting
+from api.utils.upstream import upstream_guard
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+
+class HttpClient:
+    """
+    Process-wide HTTP client for upstream fetches.
+      - One requests.Session whose adapters keep a keep-alive pool per host
+        (`pool_connections` hosts, up to `pool_maxsize` sockets each).
+      - Every request has a (connect, read) timeout; callers may pass a shorter
+        or longer one, but never None.
+      - Idempotent requests are retried `retries` times on connection errors,
+        timeouts and 429/5xx, with exponential backoff plus jitter (Retry-After
+        is honoured).
+      - A desktop User-Agent is sent unless the caller sets its own headers.
+      - Every attempt, retries included, passes the per-host rate limiter and
+        circuit breaker (api/utils/upstream.py) first and reports its outcome.
+    Responses and exceptions are plain requests ones, so `raise_for_status()` and
+    `except requests.exceptions.RequestException` keep working at the call sites.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+    RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+    def __init__(
+        self,
+        connect_timeout: float = 5,
+        read_timeout: float = 20,
+        retries: int = 2,
+        backoff_factor: float = 0.5,
+        backoff_jitter: float = 0.5,
+        pool_connections: int = 16,
+        pool_maxsize: int = 10,
+        user_agent: str = DEFAULT_USER_AGENT,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.user_agent = user_agent
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _build_session(self) -> requests.Session:
+        # No adapter-level retries: request() retries itself so that every attempt
+        # goes through the upstream guard.
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["User-Agent"] = self.user_agent
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _backoff(self, attempt: int, response: requests.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 30.0)
+        delay = self.backoff_factor * (2 ** attempt)
+        return delay + random.uniform(0, self.backoff_jitter)
+
+    def request(self, method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+        retries = self.retries if method.upper() in self.RETRY_METHODS else 0
+        for attempt in range(retries + 1):
+            last_try = attempt == retries
+            host, wait = upstream_guard.admit(url)
+            if wait:
+                time.sleep(wait)
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                upstream_guard.record(host, error=e)
+                if last_try or not isinstance(e, self.RETRY_ERRORS):
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            upstream_guard.record(host, status_code=response.status_code)
+            # The last attempt's response is handed back so callers see the real status code.
+            if response.status_code in self.RETRY_STATUSES and not last_try:
+                response.close()
+                time.sleep(self._backoff(attempt, response))
+                continue
+            return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+http_client = HttpClient(**get_setting("HTTP_CLIENT", {}))
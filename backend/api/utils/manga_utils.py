@@ -1,12 +1,22 @@
 import requests
 
+from api.cache import negative_cache
+from api.utils.http import http_client
+
+_EMPTY_METADATA = {"cover_image_url": "", "genres": []}
+
+
 def fetch_manga_metadata(title: str) -> dict:
     """
     Fetch cover image and genres for a given manga title using MangaDex API.
-    Returns dict with 'cover_image_url' and 'genres' or raises ValueError if not found.
+    Returns dict with 'cover_image_url' and 'genres' (empty values if not found).
+    Titles MangaDex does not know are remembered in the negative cache.
     """
+    if negative_cache.is_missing("mangadex-metadata", title):
+        return dict(_EMPTY_METADATA)
+
     try:
-        response = requests.get(
+        response = http_client.get(
             "https://api.mangadex.org/manga",
             params={
                 "title": title,
@@ -49,9 +59,15 @@ def fetch_manga_metadata(title: str) -> dict:
             "genres": genres
         }
 
+    except requests.exceptions.RequestException as e:
+        # Network errors and bad JSON are transient; they are not cached.
+        print(f"[ERROR] Failed to fetch manga metadata for '{title}': {e}")
+        return dict(_EMPTY_METADATA)
+    except ValueError as e:
+        # Upstream answered but has no usable entry: not worth asking again soon.
+        negative_cache.mark_missing("mangadex-metadata", title, str(e))
+        print(f"[ERROR] Failed to fetch manga metadata for '{title}': {e}")
+        return dict(_EMPTY_METADATA)
     except Exception as e:
         print(f"[ERROR] Failed to fetch manga metadata for '{title}': {e}")
-        return {
-            "cover_image_url": "",
-            "genres": []
-        }
\ No newline at end of file
+        return dict(_EMPTY_METADATA)
\ No newline at end of file
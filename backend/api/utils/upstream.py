@@ -0,0 +1,245 @@
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+from api.utils.config import get_setting
+
+
+class UpstreamUnavailable(requests.exceptions.RequestException):
+    """
+    The call was refused locally: the host's circuit is open or its rate limit
+    would mean waiting too long. Subclasses RequestException so existing
+    handlers fall back (stale snapshot, empty result) exactly as for a network error.
+    """
+
+    def __init__(self, message: str, host: str, retry_after: float):
+        super().__init__(message)
+        self.host = host
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float):
+        """
+        Takes a token, returning how long the caller must wait before using it,
+        or None (taking nothing) if that wait would exceed `max_wait`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def available(self) -> float:
+        with self._lock:
+            elapsed = time.monotonic() - self._updated
+            return min(self.burst, self._tokens + elapsed * self.rate)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls flow; `failure_threshold` consecutive failures open the circuit.
+    Open: calls are refused until `reset_timeout` seconds have passed.
+    Half-open: one probe call is let through; success closes the circuit,
+    failure opens it again for another `reset_timeout`.
+    Successes reported while open (calls admitted before it opened) are ignored.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN and self.retry_after() == 0:
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            if self.state == self.HALF_OPEN:
+                # A probe whose outcome was never reported stops blocking after reset_timeout.
+                if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                    return False
+                self._probe_started = now
+                return True
+            return self.state == self.CLOSED
+
+    def cancel_probe(self):
+        """Gives back the half-open probe slot when the admitted call is not made."""
+        with self._lock:
+            self._probe_started = None
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                return
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+
+
+class UpstreamGuard:
+    """
+    Per-host rate limiting and circuit breaking in front of every upstream call
+    (http_client, async_fetcher and the browser page loads).
+      - Each host gets a token bucket; a call waits for a token for at most
+        `max_wait` seconds, otherwise it is refused.
+      - Each host gets a circuit breaker; connection errors, timeouts, 429 and
+        5xx answers count as failures. For browser scrapes only the navigation
+        (driver.get) is guarded, so slow or missing page elements do not.
+      - Refused calls raise UpstreamUnavailable immediately.
+    Hosts not listed in `hosts` use the default rate/burst.
+    """
+
+    FAILURE_STATUSES = {429, 500, 502, 503, 504}
+    HOSTS = {
+        "kaido.to": {"rate": 4, "burst": 8},
+        "animesugetv.to": {"rate": 8, "burst": 16},
+        "mangapark.io": {"rate": 4, "burst": 8},
+        "manganow.to": {"rate": 4, "burst": 8},
+        # MangaDex asks clients to stay around 5 requests per second.
+        "api.mangadex.org": {"rate": 4, "burst": 5},
+    }
+
+    def __init__(
+        self,
+        hosts: dict = None,
+        rate: float = 4,
+        burst: int = 8,
+        max_wait: float = 5,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+    ):
+        self.hosts = {**self.HOSTS, **(hosts or {})}
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._buckets = {}
+        self._breakers = {}
+        self._refused = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_for(url: str) -> str:
+        host = (urlparse(url).hostname or "").lower()
+        return host[4:] if host.startswith("www.") else host
+
+    def _host_state(self, host: str) -> tuple:
+        with self._lock:
+            if host not in self._buckets:
+                limits = self.hosts.get(host, {})
+                self._buckets[host] = TokenBucket(limits.get("rate", self.rate), limits.get("burst", self.burst))
+                self._breakers[host] = CircuitBreaker(
+                    limits.get("failure_threshold", self.failure_threshold),
+                    limits.get("reset_timeout", self.reset_timeout),
+                )
+            return self._buckets[host], self._breakers[host]
+
+    def _refuse(self, host: str, reason: str, retry_after: float):
+        with self._lock:
+            self._refused[host] = self._refused.get(host, 0) + 1
+        print(f"[Upstream] Refusing call to {host}: {reason}")
+        return UpstreamUnavailable(f"{host} is unavailable ({reason}), please retry shortly.", host, retry_after)
+
+    def admit(self, url: str) -> tuple:
+        """
+        Checks the host's circuit and takes a rate-limit token.
+        Returns (host, seconds to wait before calling); raises UpstreamUnavailable.
+        """
+        host = self.host_for(url)
+        bucket, breaker = self._host_state(host)
+        if not breaker.allow():
+            raise self._refuse(host, f"circuit {breaker.state}", breaker.retry_after() or 1)
+        wait = bucket.reserve(self.max_wait)
+        if wait is None:
+            breaker.cancel_probe()
+            raise self._refuse(host, "rate limited", 1 / bucket.rate)
+        return host, wait
+
+    def record(self, host: str, status_code: int = None, error: Exception = None):
+        """Reports the outcome of an admitted call to the host's circuit breaker."""
+        breaker = self._host_state(host)[1]
+        if error is not None or status_code in self.FAILURE_STATUSES:
+            breaker.record_failure()
+            if breaker.state == CircuitBreaker.OPEN:
+                print(f"[Upstream] Circuit for {host} is open for {breaker.reset_timeout}s.")
+        else:
+            breaker.record_success()
+
+    @contextmanager
+    def guarded(self, url: str):
+        """
+        Admits a call to `url` (sleeping for its token) and records whether the block raised.
+        Wrap only the request itself (e.g. driver.get), not waits on what the page renders.
+        """
+        host, wait = self.admit(url)
+        if wait:
+            time.sleep(wait)
+        try:
+            yield
+        except Exception as e:
+            self.record(host, error=e)
+            raise
+        self.record(host)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hosts = list(self._breakers)
+        result = {}
+        for host in hosts:
+            bucket, breaker = self._host_state(host)
+            result[host] = {
+                "state": breaker.state,
+                "consecutive_failures": breaker.failures,
+                "times_opened": breaker.times_opened,
+                "retry_after": round(breaker.retry_after(), 1) if breaker.state == CircuitBreaker.OPEN else 0,
+                "tokens": round(bucket.available(), 2),
+                "rate": bucket.rate,
+                "burst": bucket.burst,
+                "refused": self._refused.get(host, 0),
+            }
+        return result
+
+
+upstream_guard = UpstreamGuard(**get_setting("UPSTREAM_GUARD", {}))
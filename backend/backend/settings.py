@@ -152,3 +152,90 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# Scraper caches
+# In-process LRU tier in front of the JSON files under sources/ (see api/cache).
+SOURCE_CACHE_MAX_ENTRIES = 512
+# Per-namespace memory TTLs in seconds; unset namespaces use SourceCache defaults.
+SOURCE_CACHE_TTLS = {}
+# Homepage snapshots older than this (seconds) are served stale and refreshed in the background.
+HOMEPAGE_SOFT_TTL = env.int("HOMEPAGE_SOFT_TTL", default=6 * 60 * 60)
+MANGA_HOMEPAGE_SOFT_TTL = env.int("MANGA_HOMEPAGE_SOFT_TTL", default=6 * 60 * 60)
+# Same for detail-page snapshots; their refresh is a conditional GET (ETag / Last-Modified),
+# and an unchanged page only has its snapshot timestamp bumped.
+DETAIL_PAGE_SOFT_TTL = env.int("DETAIL_PAGE_SOFT_TTL", default=24 * 60 * 60)
+MANGA_DETAIL_SOFT_TTL = env.int("MANGA_DETAIL_SOFT_TTL", default=24 * 60 * 60)
+# SQLite database (WAL mode) shared by the keyed scraper stores, e.g. the iframe cache.
+SCRAPER_CACHE_DB = os.path.join("sources", "cache.sqlite3")
+# Per-namespace disk budgets, e.g. {"read-page": {"dir": "sources/read-page", "max_bytes": ..., "max_files": ...}}.
+# Unset namespaces use DiskBudget defaults; see `manage.py cache_budget`.
+SOURCE_DISK_BUDGETS = {}
+# How long (seconds) upstream "not found" answers are remembered before asking again.
+NEGATIVE_CACHE_TTL = env.int("NEGATIVE_CACHE_TTL", default=6 * 60 * 60)
+
+# Headless browser pools
+# Per-pool overrides of api/browser PROFILES, e.g. {"scrape": {"size": 4, "max_rss_mb": 1536}}.
+# lease_timeout (seconds) and max_waiters bound how long and how many requests queue for a browser.
+BROWSER_POOLS = {}
+# Embed endpoints (relative to the episode host) tried by the plain-HTTP iframe strategy;
+# "{link_id}" is the server's data-link-id. Unset uses IframeExtractor.EMBED_ENDPOINTS.
+# WATCH_EMBED_ENDPOINTS = ["ajax/server?get={link_id}"]
+# Global budget for browser-backed endpoints (watch, switch_episode, search, chatbot):
+# max_concurrent running, max_queue waiting up to max_wait seconds, 503 + Retry-After beyond that.
+BROWSER_ADMISSION = {
+    "max_concurrent": env.int("BROWSER_MAX_CONCURRENT", default=4),
+    "max_queue": env.int("BROWSER_MAX_QUEUE", default=16),
+    "max_wait": 30,
+    "retry_after": 5,
+}
+
+# Chatbot
+# Answers to repeated questions (normalized) are served from cache for this long (seconds)...
+CHATBOT_ANSWER_CACHE_TTL = env.int("CHATBOT_ANSWER_CACHE_TTL", default=24 * 60 * 60)
+# ...and at most this many answers are kept.
+CHATBOT_ANSWER_CACHE_SIZE = 2000
+# Questions the local classifier rates off-topic with at least this probability get
+# the "false" answer without a browser session.
+CHATBOT_RELEVANCE_THRESHOLD = 0.9
+# Build the classifier in a background thread at startup instead of on the first question.
+CHATBOT_RELEVANCE_WARMUP = env.bool("CHATBOT_RELEVANCE_WARMUP", default=True)
+# Engine answering chatbot questions: "gemini" (API, token streaming; falls back to
+# "selenium" without a GEMINI_API_KEY or on errors), "selenium" (chatgpt.com in a
+# headless browser) or "stub" (canned local answers, for offline load tests).
+CHATBOT_ENGINE = env.str("CHATBOT_ENGINE", default="gemini")
+GEMINI_API_KEY = env.str("GEMINI_API_KEY", default="")
+GEMINI_MODEL = env.str("GEMINI_MODEL", default="gemini-1.5-flash")
+# Delay between words of stub answers (seconds), to mimic generation speed.
+CHATBOT_STUB_DELAY = 0.02
+
+# Shared upstream HTTP client (api/utils/http.py): per-host keep-alive pools, timeouts
+# in seconds, and retries with jittered exponential backoff on connection errors/429/5xx.
+HTTP_CLIENT = {
+    "connect_timeout": 5,
+    "read_timeout": env.int("HTTP_READ_TIMEOUT", default=20),
+    "retries": 2,
+    "backoff_factor": 0.5,
+    "backoff_jitter": 0.5,
+    "pool_maxsize": 10,
+}
+
+# Async fan-out fetcher (api/utils/async_http.py) used for multi-page search:
+# one process-wide connection pool, a global in-flight cap and a per-host cap.
+ASYNC_FETCHER = {
+    "max_in_flight": env.int("ASYNC_FETCH_MAX_IN_FLIGHT", default=32),
+    "per_host": env.int("ASYNC_FETCH_PER_HOST", default=6),
+    "connect_timeout": 5,
+    "read_timeout": 20,
+    "retries": 2,
+}
+
+# Per-host token bucket + circuit breaker in front of every upstream call (api/utils/upstream.py).
+# "hosts" overrides per-host limits, e.g. {"kaido.to": {"rate": 2, "burst": 4, "reset_timeout": 60}};
+# a circuit opens after failure_threshold consecutive failures (errors, timeouts, 429/5xx)
+# and lets one probe through after reset_timeout seconds.
+UPSTREAM_GUARD = {
+    "hosts": {},
+    "max_wait": 5,
+    "failure_threshold": env.int("UPSTREAM_FAILURE_THRESHOLD", default=5),
+    "reset_timeout": env.int("UPSTREAM_RESET_TIMEOUT", default=30),
+}